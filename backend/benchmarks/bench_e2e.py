@@ -0,0 +1,198 @@
+"""
+End-to-end latency of the backend against local stand-ins: fake_konom.py for the query
+API and fake_openai.py for the LLM, so it runs offline. The backend runs under uvicorn
+with its own HOME (configs copied from backend/configs) and cache dir, with the Konom,
+LLM and frame caches off so every request pays the full path. Reports p50/p95 latency
+and throughput for /api/analyze-request and /api/deep-dive-query at each segment count
+and concurrency level. Each request asks for a different day, so none share a fetch.
+
+    python benchmarks/bench_e2e.py
+    E2E_SEGMENTS=16 E2E_CONCURRENCY=1,8 E2E_REQUESTS=32 LLM_LATENCY_MS=800 python benchmarks/bench_e2e.py
+"""
+import asyncio
+import copy
+import json
+import math
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from benchmarks import fake_konom, fake_openai
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEGMENTS = [int(n) for n in os.getenv("E2E_SEGMENTS", "4,16,64").split(",")]
+CONCURRENCY = [int(n) for n in os.getenv("E2E_CONCURRENCY", "1,4,16").split(",")]
+REQUESTS = int(os.getenv("E2E_REQUESTS", "16"))
+KONOM_LATENCY_MS = float(os.getenv("KONOM_LATENCY_MS", "100"))
+LLM_LATENCY_MS = float(os.getenv("LLM_LATENCY_MS", "300"))
+LLM_PER_SEGMENT_MS = float(os.getenv("LLM_PER_SEGMENT_MS", "100"))
+ERROR_RATE = float(os.getenv("E2E_ERROR_RATE", "0"))
+
+SYSTEM = "BSS"
+# Segments are the product of the values of these dimensions
+DIMENSIONS = ["Data center", "Cookie Flag"]
+BASE_REQUEST = {
+    "namespace": "Header Bidder",
+    "measures": [
+        "Bid Price (HB Rendered Ad)", "Profit (HB Rendered Ad)", "Total Requests Sent (HB Provider Response)",
+        "Impressions Delivered (HB Rendered Ad)", "Bidder Win Rate (1K)", "Bidder Rev Rate (10M)",
+    ],
+    "rows": [
+        {"dimension": "Provider Group Name", "outputName": "Provider Group Name", "threshold": 5},
+        {"dimension": "Experiment Tokens", "outputName": "Experiment Tokens", "threshold": 5},
+    ],
+    "dimensionObjectList": [],
+    "filters": [{"type": "in", "filterType": "list", "dimension": "Provider Group Name", "data": ["Zeta"]}],
+}
+
+
+def request_for(i: int) -> dict:
+    """The base query over day i, so concurrent requests never coalesce into one fetch."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(days=i)
+    request_json = copy.deepcopy(BASE_REQUEST)
+    request_json["times"] = [{
+        "startTime": start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "endTime": (start + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+    }]
+    return request_json
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(workdir: str, konom_port: int, llm_port: int) -> tuple:
+    home = os.path.join(workdir, "home")
+    shutil.copytree(os.path.join(BACKEND_DIR, "configs"), os.path.join(home, ".agentic_ai_config"))
+    port = free_port()
+    env = {
+        **os.environ,
+        "HOME": home,
+        "AGENTIC_CACHE_DIR": os.path.join(workdir, "cache"),
+        "QUERY_API_BASE": f"http://127.0.0.1:{konom_port}/",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "KONOM_CACHE_ENABLED": "0",
+        "LLM_CACHE_ENABLED": "0",
+        "FRAME_SNAPSHOTS_ENABLED": "0",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}/api"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/ping").status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError("backend did not answer /api/ping")
+
+
+async def analyze(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    files = {"request_file": ("request.json", json.dumps(request_for(i)), "application/json")}
+    return await client.post("/analyze-request", files=files, data={"system": SYSTEM})
+
+
+async def deep_dive(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    payload = {"request_json": request_for(i), "system": SYSTEM, "dimensions": DIMENSIONS}
+    return await client.post("/deep-dive-query", json=payload)
+
+
+async def run_level(base_url: str, call, concurrency: int, first: int, segments=None) -> dict:
+    """
+    REQUESTS calls, at most `concurrency` at a time; latencies of the successful ones. A
+    deep dive only counts as successful with an answer for every one of its segments.
+    """
+    limit = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def one(client, i):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                response = await call(client, i)
+                ok = response.status_code == 200
+                detail = response.text[:200]
+                if ok and segments is not None and len(response.json().get("segments", [])) != segments:
+                    ok, detail = False, f"expected {segments} segments: {detail}"
+            except httpx.HTTPError as e:
+                ok, detail = False, repr(e)
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(detail)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        await call(client, first - 1)  # warm-up, not counted
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, first + i) for i in range(REQUESTS)))
+        wall = time.perf_counter() - start
+    return {"latencies": latencies, "errors": errors, "wall": wall}
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def main():
+    konom = fake_konom.KonomSettings(latency_ms=KONOM_LATENCY_MS, error_rate=ERROR_RATE)
+    llm = fake_openai.LLMSettings(latency_ms=LLM_LATENCY_MS, per_segment_ms=LLM_PER_SEGMENT_MS, error_rate=ERROR_RATE)
+    konom_server = fake_konom.start_server(0, konom)
+    llm_server = fake_openai.start_server(0, llm)
+    print(f"Konom latency {KONOM_LATENCY_MS:.0f} ms, LLM {LLM_LATENCY_MS:.0f} ms + {LLM_PER_SEGMENT_MS:.0f} ms/segment, "
+          f"error rate {ERROR_RATE:.0%}, {REQUESTS} requests per row\n")
+    print(f"{'endpoint':<18} {'segments':>8} {'concurrency':>11} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>7} "
+          f"{'errors':>6} {'LLM calls':>9}")
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    proc, base_url = start_backend(workdir, konom_server.server_port, llm_server.server_port)
+    first = 1
+    try:
+        scenarios = [("analyze-request", analyze, None)] + [("deep-dive-query", deep_dive, n) for n in SEGMENTS]
+        for name, call, segments in scenarios:
+            # Each of the two dimensions gets sqrt(segments) values
+            konom.fanout = max(1, round(math.sqrt(segments))) if segments else 4
+            expected = konom.fanout ** len(DIMENSIONS) if segments else None
+            for concurrency in CONCURRENCY:
+                calls_before = llm.counters["requests"]
+                level = asyncio.run(run_level(base_url, call, concurrency, first, expected))
+                first += REQUESTS + 1
+                latencies = level["latencies"]
+                llm_calls = (llm.counters["requests"] - calls_before) / (REQUESTS + 1)
+                shown = expected or "-"
+                if latencies:
+                    print(f"{name:<18} {shown:>8} {concurrency:>11} {statistics.median(latencies) * 1e3:>8.0f} "
+                          f"{percentile(latencies, 0.95) * 1e3:>8.0f} {len(latencies) / level['wall']:>7.2f} "
+                          f"{len(level['errors']):>6} {llm_calls:>9.1f}")
+                else:
+                    print(f"{name:<18} {shown:>8} {concurrency:>11} {'-':>8} {'-':>8} {0:>7.2f} {len(level['errors']):>6}")
+                if level["errors"]:
+                    print(f"    first error: {level['errors'][0]}")
+    finally:
+        proc.terminate()
+        proc.wait()
+        konom_server.shutdown()
+        llm_server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"\nfake Konom: {konom.counters}, fake OpenAI: {llm.counters}")
+
+
+if __name__ == "__main__":
+    main()
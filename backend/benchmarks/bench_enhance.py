@@ -0,0 +1,52 @@
+"""
+Timing of enhance_with_percentage_changes against the original per-row implementation
+(tests/enhance_reference.py, the golden reference of tests/test_enhance.py), at 10k and
+1M rows and for grouped baselines. Most of what remains is formatting one string per
+cell (np.char.mod and .tolist()), which numpy does not vectorize.
+
+    python benchmarks/bench_enhance.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from services.utils import enhance_with_percentage_changes
+from tests.enhance_reference import legacy_enhance, make_frame, per_segment_legacy
+
+SIZES = [10_000, 1_000_000]
+
+
+def time_grouped(n_rows: int, n_segments: int):
+    df = make_frame(n_rows)
+    df["Segment"] = np.arange(n_rows) // len(df["Experiment Tokens"].unique()) % n_segments
+    start = time.perf_counter()
+    per_segment_legacy(df, ["Segment"])
+    legacy_t = time.perf_counter() - start
+    start = time.perf_counter()
+    enhance_with_percentage_changes(df.copy(), group_cols=["Segment"])
+    new_t = time.perf_counter() - start
+    print(f"{n_rows:>10,} rows / {n_segments:,} segments: per-segment {legacy_t:.3f}s, grouped {new_t:.3f}s ({legacy_t / new_t:.1f}x)")
+
+
+def main():
+    print(f"{'rows':>10} {'per-row (s)':>12} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_rows in SIZES:
+        df = make_frame(n_rows)
+        start = time.perf_counter()
+        expected = legacy_enhance(df.copy())
+        legacy_t = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = enhance_with_percentage_changes(df.copy())
+        new_t = time.perf_counter() - start
+        pd.testing.assert_frame_equal(expected, actual)
+        print(f"{n_rows:>10,} {legacy_t:>12.3f} {new_t:>15.3f} {legacy_t / new_t:>7.1f}x")
+    for n_segments in (10, 1000):
+        time_grouped(100_000, n_segments)
+
+
+if __name__ == "__main__":
+    main()
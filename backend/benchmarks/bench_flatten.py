@@ -0,0 +1,48 @@
+"""
+Rows/sec of the split-tree flattener against the old recursive list-of-dicts version
+(tests/flatten_reference.py), on synthetic trees of increasing depth and fan-out.
+
+    python benchmarks/bench_flatten.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from benchmarks.synthetic import make_split_response
+from services.data_parser import flatten_split_tree
+from tests.flatten_reference import legacy_flatten
+
+CASES = [(1, 10), (2, 10), (3, 10), (4, 6), (4, 10), (6, 4), (8, 3)]
+
+
+def columnar_flatten(result: dict) -> pd.DataFrame:
+    columns, _ = flatten_split_tree(result)
+    return pd.DataFrame(columns)
+
+
+def best_of(fn, arg, repeat=3):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    print(f"{'depth':>5} {'fanout':>6} {'rows':>9} {'legacy rows/s':>14} {'columnar rows/s':>16} {'speedup':>8}")
+    for depth, fanout in CASES:
+        result = make_split_response(depth, fanout)["result"]
+        legacy_t, legacy_df = best_of(legacy_flatten, result)
+        new_t, new_df = best_of(columnar_flatten, result)
+        pd.testing.assert_frame_equal(legacy_df.fillna(0), new_df.fillna(0))
+        rows = len(new_df)
+        print(f"{depth:>5} {fanout:>6} {rows:>9} {rows / legacy_t:>14,.0f} {rows / new_t:>16,.0f} {legacy_t / new_t:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
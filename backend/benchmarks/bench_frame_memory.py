@@ -0,0 +1,77 @@
+"""
+Memory footprint of the parsed frame: the old list-of-values DataFrame with fillna(0)
+against the typed frame (categorical dimensions, float measures), on large deep-dive
+shaped responses. The float32 row types every measure as float32, as `dtype: float32`
+in metric_config would.
+
+    python benchmarks/bench_frame_memory.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_split_response, MEASURES
+from config.config_manager import ConfigSnapshot, current_config
+from services.data_parser import flatten_split_tree, typed_frame
+
+CASES = [(3, 10), (4, 10), (6, 6)]
+
+
+def legacy_frame(columns: dict) -> pd.DataFrame:
+    df = pd.DataFrame(columns)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df.fillna(0)
+
+
+def timed(fn, arg):
+    start = time.perf_counter()
+    out = fn(arg)
+    return time.perf_counter() - start, out
+
+
+def mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def check_same(legacy: pd.DataFrame, typed: pd.DataFrame):
+    assert list(legacy.columns) == list(typed.columns)
+    for col in legacy.columns:
+        if typed[col].dtype == "category":
+            assert legacy[col].astype(str).tolist() == typed[col].astype(str).tolist(), col
+        else:
+            np.testing.assert_allclose(legacy[col].to_numpy(dtype=np.float64), typed[col].to_numpy(dtype=np.float64), rtol=1e-6)
+    assert not any(typed[col].dtype == object for col in typed.columns)
+
+
+def float32_config() -> ConfigSnapshot:
+    """The current config with `dtype: float32` on every synthetic measure."""
+    config = current_config()
+    files = dict(config._files)
+    files["metric_config"] = {m: {"dtype": "float32"} for m in MEASURES}
+    return ConfigSnapshot(config.version, files)
+
+
+def main():
+    narrow_config = float32_config()
+    print(f"{'depth':>5} {'fanout':>6} {'rows':>9} {'legacy MB':>10} {'typed MB':>9} {'float32 MB':>11} {'legacy s':>9} {'typed s':>8}")
+    for depth, fanout in CASES:
+        columns, _ = flatten_split_tree(make_split_response(depth, fanout)["result"])
+        legacy_t, legacy = timed(legacy_frame, columns)
+        typed_t, typed = timed(typed_frame, columns)
+        check_same(legacy, typed)
+
+        narrow = typed_frame(columns, narrow_config)
+        check_same(legacy, narrow)
+
+        print(f"{depth:>5} {fanout:>6} {len(typed):>9} {mb(legacy):>10.1f} {mb(typed):>9.1f} {mb(narrow):>11.1f} "
+              f"{legacy_t:>9.3f} {typed_t:>8.3f}")
+    print("\nlegacy dtypes:", dict(legacy.dtypes.astype(str).value_counts()))
+    print("typed dtypes: ", dict(typed.dtypes.astype(str).value_counts()))
+
+
+if __name__ == "__main__":
+    main()
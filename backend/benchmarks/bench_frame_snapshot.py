@@ -0,0 +1,71 @@
+"""
+Reloading a prepared frame: parsing and preprocessing the Konom response again (what
+every repeat of a query paid, network aside) against the memory-mapped Arrow IPC
+snapshot, with a Parquet read for comparison. "heap MB" is the peak Python-heap
+allocation (tracemalloc) while loading; mapped columns do not count towards it.
+
+    python benchmarks/bench_frame_snapshot.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from benchmarks.synthetic import make_split_response
+from config.config_manager import current_config
+from services.data_loader import prepare_frame
+from services.frame_snapshots import FrameSnapshots
+
+CASES = [(4, 10), (6, 6)]
+REQUEST = {"times": [{"startTime": "2025-05-20T00:00:00.000Z", "endTime": "2025-05-21T00:00:00.000Z"}]}
+
+
+def measured(fn, repeat=3):
+    """(best seconds, peak heap MB, result); timed untraced, since tracemalloc slows pandas down."""
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return best, peak, out
+
+
+def main():
+    config = current_config()
+    print(f"{'rows':>8} {'file MB':>8} {'parse s':>8} {'heap MB':>8} {'write s':>8} "
+          f"{'mmap s':>8} {'heap MB':>8} {'parquet s':>10} {'heap MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshots = FrameSnapshots(os.path.join(tmp, "frames"), max_bytes=1 << 40)
+        for depth, fanout in CASES:
+            response = make_split_response(depth, fanout)
+            parse_t, parse_mb, df = measured(lambda: prepare_frame(response, config))
+
+            start = time.perf_counter()
+            snapshots.put(REQUEST, config, df)
+            write_t = time.perf_counter() - start
+            file_mb = snapshots.stats()["bytes"] / 1e6
+
+            mmap_t, mmap_mb, mapped = measured(lambda: snapshots.get(REQUEST, config))
+            pd.testing.assert_frame_equal(mapped, df)
+
+            parquet_path = os.path.join(tmp, "frame.parquet")
+            df.to_parquet(parquet_path, index=False)
+            parquet_t, parquet_mb, _ = measured(lambda: pd.read_parquet(parquet_path))
+
+            print(f"{len(df):>8} {file_mb:>8.1f} {parse_t:>8.3f} {parse_mb:>8.1f} {write_t:>8.3f} "
+                  f"{mmap_t:>8.4f} {mmap_mb:>8.1f} {parquet_t:>10.3f} {parquet_mb:>8.1f}")
+            os.remove(parquet_path)
+            for name in os.listdir(snapshots.directory):
+                os.remove(os.path.join(snapshots.directory, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+preprocess_dataframe against the old column-by-column version on wide frames. Both
+log to a discarded stream, so the per-column log lines are paid for but not printed.
+
+    python benchmarks/bench_preprocess.py
+"""
+import logging
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from services import preprocess
+from services.preprocess import preprocess_dataframe
+
+ROWS = 1_000
+WIDTHS = [50, 500, 2_000]
+
+legacy_logger = logging.getLogger("bench.legacy_preprocess")
+
+
+def legacy_preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    logger = legacy_logger
+    logger.info("Starting dataframe preprocessing")
+    logger.info(f"Initial columns: {df.columns.tolist()}")
+    df = df.rename(columns=lambda x: x.strip() if isinstance(x, str) else x)
+    logger.info("Stripped whitespace from column names")
+    numeric_columns = df.select_dtypes(include=['float', 'int']).columns
+    logger.info(f"Numeric columns found: {numeric_columns.tolist()}")
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+        logger.info(f"Converted column {col} to numeric")
+    if 'Total Requests Sent (HB Provider Response)' in df.columns:
+        df['Cost'] = df['Total Requests Sent (HB Provider Response)'].astype(float) * 0.025 / 1_000_000
+        logger.info("Added Cost column")
+    else:
+        df['Cost'] = 0.0
+    if 'Profit (HB Rendered Ad)' in df.columns:
+        df['Net Profit'] = df['Profit (HB Rendered Ad)'].astype(float) - df['Cost']
+        logger.info("Added Net Profit column")
+    else:
+        df['Net Profit'] = -df['Cost']
+    for col in df.select_dtypes(include=['float', 'int']).columns:
+        df[col] = df[col].round(2)
+    logger.info("Rounded numeric columns")
+    logger.info("Preprocessing completed successfully")
+    return df
+
+
+def make_frame(width: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {
+        "Data center": pd.Categorical(rng.choice(["dc1", "dc2", "dc3"], ROWS)),
+        "Experiment Tokens": pd.Categorical(rng.choice(["lessCtrl:0", "lessCtrl:1"], ROWS)),
+        "Total Requests Sent (HB Provider Response)": rng.uniform(0, 1e7, ROWS),
+        "Profit (HB Rendered Ad)": rng.uniform(-1e3, 1e5, ROWS),
+    }
+    for i in range(width - len(data)):
+        data[f" Measure {i} "] = rng.uniform(0, 1e6, ROWS)
+    return pd.DataFrame(data)
+
+
+def best_of(fn, df, repeat=5):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    # The legacy version fragments wide frames; pandas warns about it on every run
+    warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+    discard = logging.StreamHandler(open(os.devnull, "w"))
+    for logger in (legacy_logger, preprocess.logger):
+        logger.handlers = [discard]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+    print(f"{'columns':>8} {'legacy ms':>10} {'new ms':>8} {'legacy us/col':>14} {'new us/col':>11} {'speedup':>8}")
+    for width in WIDTHS:
+        df = make_frame(width)
+        legacy_t, legacy_df = best_of(lambda d: legacy_preprocess(d.copy()), df)
+        new_t, new_df = best_of(preprocess_dataframe, df)
+        pd.testing.assert_frame_equal(legacy_df, new_df)
+        print(f"{width:>8} {legacy_t * 1e3:>10.1f} {new_t * 1e3:>8.1f} {legacy_t / width * 1e6:>14.1f} "
+              f"{new_t / width * 1e6:>11.1f} {legacy_t / new_t:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
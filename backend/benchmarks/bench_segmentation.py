@@ -0,0 +1,67 @@
+"""
+Deep-dive segmentation: the old boolean mask per segment key against the single
+groupby split, both serializing every segment's records.
+
+    python benchmarks/bench_segmentation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import DIMENSIONS as SPLIT_DIMENSIONS, MEASURES, TOKENS
+from services.agent_runner import split_segments
+
+DIMENSIONS = SPLIT_DIMENSIONS[:3]
+# (segments per dimension, rows per segment) -> 10 * 10 * 10 = 1,000 segments
+CASES = [((10, 10, 10), 4), ((10, 10, 10), 20), ((10, 10, 1), 20)]
+
+
+def make_frame(cardinalities, rows_per_segment: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    grids = np.meshgrid(*[np.arange(c) for c in cardinalities], indexing="ij")
+    keys = [g.ravel().repeat(rows_per_segment) for g in grids]
+    n_rows = len(keys[0])
+    df = pd.DataFrame({dim: [f"{dim[:2]}{k}" for k in key] for dim, key in zip(DIMENSIONS, keys)})
+    df["Experiment Tokens"] = np.array(TOKENS)[np.arange(n_rows) % len(TOKENS)]
+    for measure in MEASURES:
+        df[measure] = rng.normal(1e3, 3e2, n_rows)
+    # Shuffle so segments are interleaved, as they come out of a flattened response
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def mask_loop(df: pd.DataFrame, dimensions):
+    segments = []
+    for seg in df[dimensions].drop_duplicates().to_dict(orient='records'):
+        mask = (df[list(seg)] == pd.Series(seg)).all(axis=1)
+        seg_df = df[mask]
+        metrics_table = seg_df.round(2).to_dict(orient='records')
+        segment_name = ', '.join([f"{k} = {v}" for k, v in seg.items()])
+        segments.append((segment_name, metrics_table))
+    return segments
+
+
+def groupby_split(df: pd.DataFrame, dimensions):
+    return [(job.segment_name, job.metrics_table) for job in split_segments(df, dimensions)]
+
+
+def main():
+    print(f"{'segments':>9} {'rows':>8} {'mask loop (s)':>14} {'groupby (s)':>12} {'speedup':>8}")
+    for cardinalities, rows_per_segment in CASES:
+        dims = DIMENSIONS[:len(cardinalities)]
+        df = make_frame(cardinalities, rows_per_segment)
+        start = time.perf_counter()
+        expected = mask_loop(df, dims)
+        legacy_t = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = groupby_split(df, dims)
+        new_t = time.perf_counter() - start
+        assert expected == actual
+        print(f"{len(actual):>9,} {len(df):>8,} {legacy_t:>14.3f} {new_t:>12.3f} {legacy_t / new_t:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Backend startup: `python -X importtime` breakdown of `import main`, the cost the lazy
+imports defer to first use, and time from process start to the first /api/ping
+answer under uvicorn (what the Electron shell waits on). Exits non-zero when the
+median time to first ping exceeds STARTUP_PING_BUDGET_MS, when `import main`
+pulls in a heavy dependency again, or when main.spec stops listing a module the
+PyInstaller bundle only imports by name.
+
+    python benchmarks/bench_startup.py
+"""
+import ast
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPEC_PATH = os.path.join(os.path.dirname(BACKEND_DIR), "main.spec")
+
+RUNS = int(os.getenv("STARTUP_RUNS", "5"))
+PING_BUDGET_MS = float(os.getenv("STARTUP_PING_BUDGET_MS", "1500"))
+# Must stay out of `import main`; they load on first use or in the background preload
+HEAVY_MODULES = ["pandas", "numpy", "openai", "httpx", "requests", "yaml"]
+# Imported by name, so the bundle only has them through main.spec's hiddenimports
+NAME_IMPORTED = ["pyarrow.parquet"]
+
+
+def run_python(*args: str, env: dict = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, **(env or {})}, check=True,
+    )
+
+
+def import_times() -> list:
+    """(cumulative us, module) for `main` and every module it imports directly."""
+    err = run_python("-X", "importtime", "-c", "import main").stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append((int(cumulative), name.strip()))
+    return rows
+
+
+def loaded_heavy_modules() -> list:
+    code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return [m for m in run_python("-c", code).stdout.strip().split(",") if m]
+
+
+def eager_seconds() -> tuple:
+    """`import main` alone, and with the modules it now defers, as the old main.py paid."""
+    code = (
+        "import time, importlib; t = time.perf_counter(); import main; a = time.perf_counter() - t; "
+        "[importlib.import_module(m) for m in main.PRELOAD_MODULES]; print(a, time.perf_counter() - t)"
+    )
+    lazy, eager = run_python("-c", code).stdout.split()
+    return float(lazy), float(eager)
+
+
+def missing_hidden_imports() -> list:
+    """Modules imported by name (main.PRELOAD_MODULES and NAME_IMPORTED) that main.spec does not list."""
+    preload = run_python("-c", "import main; print(','.join(main.PRELOAD_MODULES))").stdout.strip().split(",")
+    listed = set()
+    for node in ast.walk(ast.parse(open(SPEC_PATH).read())):
+        if isinstance(node, ast.keyword) and node.arg == "hiddenimports":
+            listed.update(ast.literal_eval(node.value))
+    return [m for m in preload + NAME_IMPORTED if m not in listed]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_ping(timeout: float = 30.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ping", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"/api/ping did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    rows = sorted(import_times(), reverse=True)
+    print("import main (python -X importtime, cumulative):")
+    for cumulative, name in rows[:12]:
+        print(f"  {cumulative / 1e3:>8.1f} ms  {name}")
+
+    heavy = loaded_heavy_modules()
+    lazy, eager = eager_seconds()
+    print(f"\nimport main: {lazy * 1e3:.0f} ms; with the deferred service modules: {eager * 1e3:.0f} ms")
+    print(f"heavy modules loaded by import main: {heavy or 'none'}")
+    hidden = missing_hidden_imports()
+    print(f"imported by name but missing from main.spec hiddenimports: {hidden or 'none'}")
+
+    pings = [time_to_first_ping() for _ in range(RUNS)]
+    median = statistics.median(pings)
+    print(f"time to first /api/ping over {RUNS} runs: median {median * 1e3:.0f} ms, "
+          f"min {min(pings) * 1e3:.0f} ms, max {max(pings) * 1e3:.0f} ms (budget {PING_BUDGET_MS:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: import main loads {heavy}; import them inside the functions that use them")
+        failed = True
+    if hidden:
+        print(f"FAIL: add {hidden} to hiddenimports in main.spec, or the bundle fails on first use")
+        failed = True
+    if median * 1e3 > PING_BUDGET_MS:
+        print("FAIL: time to first ping is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stand-in for the Konom query API. Every POST returns a nested `split` response
+shaped by the request: one level per dimension in its 'rows' (Experiment Tokens are
+the leaves), `fanout` values per level, and the request's measures or `measures`
+synthetic ones. Values are seeded from the request, so a query always gets the same
+answer. Latency and errors (e.g. 503, which the client retries) can be injected.
+
+    python benchmarks/fake_konom.py --port 8766 --fanout 4 --latency-ms 150 --error-rate 0.05
+    QUERY_API_BASE=http://127.0.0.1:8766/ uvicorn main:app
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import MEASURES, TOKENS, make_split_response
+
+# Levels Konom puts above the leaves or at the root, not split on by the fake
+ROOT_DIMENSIONS = {"Provider Group Name", "Experiment Tokens"}
+
+
+class KonomSettings:
+    """Shape of the responses and the faults to inject; change them while the server runs."""
+
+    def __init__(self, fanout: int = 4, measures: Optional[int] = None, tokens: int = 3,
+                 latency_ms: float = 100.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503):
+        self.fanout = fanout
+        self.measures = measures
+        self.tokens = tokens
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0}
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+
+def measure_names(request_json: dict, count: Optional[int]) -> List[str]:
+    if count is None:
+        requested = [m for m in request_json.get("measures") or [] if isinstance(m, str)]
+        if requested:
+            return requested
+        count = len(MEASURES)
+    return (MEASURES + [f"Measure {i}" for i in range(max(0, count - len(MEASURES)))])[:count]
+
+
+def konom_response(request_json: dict, settings: KonomSettings) -> dict:
+    dims = [r.get("dimension") for r in request_json.get("rows") or [] if isinstance(r, dict)]
+    dims = [d for d in dims if d and d not in ROOT_DIMENSIONS]
+    tokens = TOKENS + [f"lessCtrl:{i}" for i in range(len(TOKENS), settings.tokens)]
+    seed = int(hashlib.sha256(json.dumps(request_json, sort_keys=True).encode()).hexdigest()[:8], 16)
+    return make_split_response(
+        depth=len(dims), fanout=settings.fanout, measures=measure_names(request_json, settings.measures),
+        tokens=tokens[:settings.tokens], seed=seed, dimensions=dims,
+    )
+
+
+class KonomHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = KonomSettings()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        settings = self.settings
+        settings.count("requests")
+        try:
+            request_json = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self.reply(400, b'{"error": "invalid JSON"}')
+            return
+        delay = settings.latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+        if random.random() < settings.error_rate:
+            settings.count("errors")
+            self.reply(settings.error_status, b'{"error": "injected failure"}', {"Retry-After": "0"})
+            return
+        self.reply(200, json.dumps(konom_response(request_json, settings)).encode("utf-8"))
+
+
+def start_server(port: int = 0, settings: Optional[KonomSettings] = None) -> ThreadingHTTPServer:
+    """Serves on 127.0.0.1 from a daemon thread; port 0 picks a free one (see server.server_port)."""
+    handler = type("Handler", (KonomHandler,), {"settings": settings or KonomSettings()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--fanout", type=int, default=4, help="values per dimension level")
+    parser.add_argument("--measures", type=int, default=None, help="synthetic measures instead of the requested ones")
+    parser.add_argument("--tokens", type=int, default=3, help="experiment tokens per innermost node")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    settings = KonomSettings(args.fanout, args.measures, args.tokens, args.latency_ms, args.jitter_ms,
+                             args.error_rate, args.error_status)
+    server = start_server(args.port, settings)
+    print(f"Fake Konom on http://127.0.0.1:{server.server_port}/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
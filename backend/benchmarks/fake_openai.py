@@ -0,0 +1,137 @@
+"""
+Local OpenAI-compatible chat completions endpoint for the analysis prompts. It answers
+with JSON in the shape each prompt asks for: the overall verdict, one deep-dive
+segment, a batch of segments, or the cross-segment bullet points. Latency grows with
+the number of segments answered, like output tokens do; errors (e.g. 429, which the
+openai client retries) can be injected.
+
+    python benchmarks/fake_openai.py --port 8767 --latency-ms 400 --per-segment-ms 150
+    OPENAI_BASE_URL=http://127.0.0.1:8767/v1 OPENAI_API_KEY=fake uvicorn main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+SEGMENT_LINE = re.compile(r"^Segment: (.*)$", re.M)
+
+
+class LLMSettings:
+    """Reply latency and faults to inject; change them while the server runs."""
+
+    def __init__(self, latency_ms: float = 300.0, per_segment_ms: float = 100.0,
+                 error_rate: float = 0.0, error_status: int = 429):
+        self.latency_ms = latency_ms
+        self.per_segment_ms = per_segment_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0}
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+
+def metric_rows() -> List[dict]:
+    return [
+        {"name": "Bid Price (HB Rendered Ad)", "value": 1.2, "baseline": 1.0, "change": 20.0, "significance": "positive"},
+        {"name": "Net Profit", "value": 95.0, "baseline": 100.0, "change": -5.0, "significance": "negative"},
+    ]
+
+
+def verdict(name: str) -> dict:
+    return {
+        "key_insights": [f"{name}: bid price is up 20% on the control."],
+        "final_verdict": "Final Verdict: lessCtrl:1 is best overall",
+        "scalability_verdict": {"verdict": "Scale", "reasons": ["Net profit holds within 5%."]},
+    }
+
+
+def answer(prompt: str) -> tuple:
+    """(reply text, segments answered) for one analysis prompt."""
+    segments = SEGMENT_LINE.findall(prompt)
+    if "JSON array of bullet" in prompt:
+        return json.dumps(["Segments agree: the treatment lifts bid price by about 20%."]), 1
+    if "one object per segment" in prompt:
+        return json.dumps([{"segment": s, "metrics": metric_rows(), **verdict(s)} for s in segments]), len(segments)
+    if segments:
+        return json.dumps({"segment": segments[0], "metrics": metric_rows(), **verdict(segments[0])}), 1
+    return json.dumps({"metrics_table": metric_rows(), **verdict("Overall")}), 1
+
+
+class OpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = LLMSettings()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        settings = self.settings
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        settings.count("requests")
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content, segments = answer(prompt)
+        time.sleep((settings.latency_ms + settings.per_segment_ms * segments) / 1000)
+        if random.random() < settings.error_rate:
+            settings.count("errors")
+            self.reply(settings.error_status, {"error": {"message": "injected failure", "type": "rate_limit_error"}})
+            return
+        self.reply(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+
+def start_server(port: int = 0, settings: Optional[LLMSettings] = None) -> ThreadingHTTPServer:
+    """Serves on 127.0.0.1 from a daemon thread; port 0 picks a free one (see server.server_port)."""
+    handler = type("Handler", (OpenAIHandler,), {"settings": settings or LLMSettings()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--per-segment-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args()
+    server = start_server(args.port, LLMSettings(args.latency_ms, args.per_segment_ms, args.error_rate, args.error_status))
+    print(f"Fake OpenAI on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
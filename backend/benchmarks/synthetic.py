@@ -0,0 +1,61 @@
+"""Synthetic Konom-shaped responses for the benchmarks in this folder."""
+import random
+from typing import List, Optional
+
+DIMENSIONS = [
+    "Data center",
+    "Cookie Flag",
+    "Device Type (as in HB Reports)",
+    "Country Code",
+    "New Browser Name",
+    "New OS Name",
+    "Integration Type",
+    "State",
+]
+
+MEASURES = [
+    "Bid Price (HB Rendered Ad)",
+    "Profit (HB Rendered Ad)",
+    "Total Requests Sent (HB Provider Response)",
+    "Impressions Delivered (HB Rendered Ad)",
+    "Valid Responses",
+    "Bidder Win Rate (1K)",
+    "Bidder Rev Rate (10M)",
+    "MNET Rev Rate (10M)",
+]
+
+TOKENS = ["lessCtrl:0", "lessCtrl:1", "lessCtrl:2"]
+
+
+def make_split_response(
+    depth: int,
+    fanout: int,
+    measures: Optional[List[str]] = None,
+    tokens: Optional[List[str]] = None,
+    seed: int = 0,
+    dimensions: Optional[List[str]] = None,
+) -> dict:
+    """
+    Builds {"result": ...} with `depth` nested dimension levels of `fanout` values each,
+    and one leaf per experiment token under every innermost node. Leaf count is
+    fanout ** depth * len(tokens). `dimensions` names the levels (and then sets the depth).
+    """
+    measures = measures or MEASURES
+    tokens = tokens or TOKENS
+    rnd = random.Random(seed)
+    if dimensions is not None:
+        depth = len(dimensions)
+    dims = dimensions or [DIMENSIONS[i] if i < len(DIMENSIONS) else f"Dimension {i}" for i in range(depth)]
+
+    def leaves():
+        return [
+            {"Experiment Tokens": token, **{m: round(rnd.uniform(0, 1e6), 3) for m in measures}}
+            for token in tokens
+        ]
+
+    def build(level: int) -> list:
+        if level == depth:
+            return leaves()
+        return [{dims[level]: f"{dims[level][:3]}-{i}", "split": build(level + 1)} for i in range(fanout)]
+
+    return {"result": {"Provider Group Name": "Zeta", "split": build(0)}}
@@ -1,12 +1,12 @@
-import yaml
 import os
-from functools import lru_cache
+import threading
+from typing import Any, Dict, Optional
 
 CONFIG_DIR = os.path.expanduser("~/.agentic_ai_config")
-print(f"[CONFIG MANAGER] CONFIG_DIR resolved to: {CONFIG_DIR}")
 
 
 def load_yaml(file_path: str) -> dict:
+    import yaml
     try:
         print(f"[LOAD YAML] Loading file: {file_path}")
         with open(file_path, 'r') as f:
@@ -19,20 +19,136 @@ def load_yaml(file_path: str) -> dict:
     except yaml.YAMLError as e:
         raise ValueError(f"Invalid YAML in {file_path}: {e}")
 
-@lru_cache(maxsize=8)
+
+CONFIG_FILES = {
+    "metric_config": "metric_config.yaml",
+    "system_definition": "system_definition.yaml",
+    "deep_dive_config": "deep_dive_config.yaml",
+}
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes, so a config snapshot can be shared between requests."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Config snapshots are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class ConfigSnapshot:
+    """
+    One consistent, read-only view of the config files. A file that is missing or does
+    not parse raises its error when it is read, as loading it directly would.
+    """
+
+    def __init__(self, version: int, files: Dict[str, Any]):
+        self.version = version
+        self._files = {name: value if isinstance(value, Exception) else freeze(value) for name, value in files.items()}
+
+    def get(self, name: str) -> dict:
+        value = self._files[name]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    @property
+    def metric_config(self) -> dict:
+        return self.get("metric_config")
+
+    @property
+    def system_definition(self) -> dict:
+        return self.get("system_definition")
+
+    @property
+    def deep_dive_config(self) -> dict:
+        return self.get("deep_dive_config")
+
+
+class ConfigRegistry:
+    """
+    Parses each config file once and hands out versioned snapshots. Every snapshot() call
+    stats the files; one whose inode, mtime or size changed is parsed again and the
+    version goes up. invalidate() forces a re-parse (e.g. after an upload). Callers keep
+    the snapshot they started with, so a long-running job sees one version throughout.
+    """
+
+    def __init__(self, directory: str = CONFIG_DIR, files: Dict[str, str] = CONFIG_FILES):
+        self.directory = directory
+        self.files = files
+        self._lock = threading.Lock()
+        self._stamps: Dict[str, Optional[tuple]] = {}
+        self._snapshot: Optional[ConfigSnapshot] = None
+
+    def _stamp(self, filename: str) -> Optional[tuple]:
+        try:
+            st = os.stat(os.path.join(self.directory, filename))
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def snapshot(self) -> ConfigSnapshot:
+        stamps = {name: self._stamp(filename) for name, filename in self.files.items()}
+        snapshot = self._snapshot
+        if snapshot is not None and stamps == self._stamps:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and stamps == self._stamps:
+                return self._snapshot
+            previous = self._snapshot._files if self._snapshot is not None else {}
+            files = {}
+            for name, filename in self.files.items():
+                path = os.path.join(self.directory, filename)
+                if name in previous and stamps[name] == self._stamps.get(name):
+                    files[name] = previous[name]
+                elif stamps[name] is None:
+                    files[name] = FileNotFoundError(f"File not found: {path}")
+                else:
+                    try:
+                        files[name] = load_yaml(path)
+                    except (OSError, ValueError) as e:
+                        files[name] = e
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            self._snapshot = ConfigSnapshot(version, files)
+            self._stamps = stamps
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._stamps = {}
+
+
+config_registry = ConfigRegistry()
+
+
+def current_config() -> ConfigSnapshot:
+    return config_registry.snapshot()
+
+
 def load_metric_config() -> dict:
-    path = os.path.join(CONFIG_DIR, 'metric_config.yaml')
-    return load_yaml(path)
+    return current_config().metric_config
+
+
+def load_system_definition(system: Optional[str] = None) -> dict:
+    return current_config().system_definition
 
-@lru_cache(maxsize=8)
-def load_system_definition(system: str) -> dict:
-    path = os.path.join(CONFIG_DIR, 'system_definition.yaml')
-    return load_yaml(path)
 
-@lru_cache(maxsize=8)
 def load_deep_dive_config() -> dict:
-    path = os.path.join(CONFIG_DIR, 'deep_dive_config.yaml')
-    return load_yaml(path)
+    return current_config().deep_dive_config
 
 # @lru_cache(maxsize=8)
 # def load_system_config() -> dict:
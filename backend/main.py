@@ -1,21 +1,66 @@
+import os
+import sys
+import asyncio
+import importlib
+import logging
+from dotenv import load_dotenv
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+# Route modules import the services (pandas, openai, httpx) inside their handlers,
+# so importing them here keeps /api/ping fast
 from routes.config_routes import router as config_router
 from routes.analyze_routes import router as analyze_router
 from routes.deep_dive_routes import router as deep_dive_router
+from routes.cache_routes import router as cache_router
+from routes.job_routes import router as job_router
+from routes.result_routes import router as result_router
 from config.env_loader import load_env_vars
-import os
-from dotenv import load_dotenv
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+from services.job_queue import job_queue
 
 # load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Imported in the background once the server is up, so the first analysis does not pay for them
+PRELOAD_MODULES = ["services.agent_runner", "services.llm_analyzer", "services.data_loader", "openai"]
+BACKEND_PRELOAD = os.getenv("BACKEND_PRELOAD", "1") == "1"
+
 app = FastAPI()
 
 @app.get("/api/ping")
 def ping():
     return {"message": "pong"}
 
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Preloading {name} failed: {e}")
+    # tiktoken, if installed, downloads its BPE file on first use; pay for that here rather than in a request
+    try:
+        from services.prompt_builder import count_tokens
+        count_tokens("")
+    except Exception as e:
+        logger.warning(f"Preloading the tokenizer failed: {e}")
+
+@app.on_event("startup")
+async def start_preload():
+    if BACKEND_PRELOAD:
+        # Not awaited: startup must not wait for it, or neither would /api/ping
+        app.state.preload = asyncio.get_running_loop().run_in_executor(None, preload_modules)
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await job_queue.shutdown()
+    # Only close clients whose modules were ever loaded
+    if "services.konom_client" in sys.modules:
+        await sys.modules["services.konom_client"].close_konom_clients()
+    if "utils.llm_utils" in sys.modules:
+        await sys.modules["utils.llm_utils"].close_llm_client()
+
 # Enable CORS for all origins
 app.add_middleware(
     CORSMiddleware,
@@ -30,7 +75,10 @@ load_env_vars()
 app.include_router(config_router, prefix="/api")
 app.include_router(analyze_router, prefix="/api")
 app.include_router(deep_dive_router, prefix="/api")
+app.include_router(cache_router, prefix="/api")
+app.include_router(job_router, prefix="/api")
+app.include_router(result_router, prefix="/api")
 
 # @app.get("/ping")
 # def ping():
-#     return {"message": "pong"} 
\ No newline at end of file
+#     return {"message": "pong"}
@@ -22,6 +22,7 @@ class DeepDiveQuery(BaseModel):
     request_json: dict
     system: str
     dimensions: List[str]
+    bypass_llm_cache: bool = False
 
 class DeepDiveSegment(BaseModel):
     segment: str
@@ -31,4 +32,5 @@ class DeepDiveSegment(BaseModel):
     scalability_verdict: ScalabilityVerdict
 
 class DeepDiveResponse(BaseModel):
-    segments: List[DeepDiveSegment]
\ No newline at end of file
+    segments: List[DeepDiveSegment]
+    prompt_report: Optional[Dict[str, int]] = None
\ No newline at end of file
@@ -1,21 +1,26 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, HTTPException, status
 from fastapi.responses import JSONResponse
 import json
-from services.konom_query import fetch_data
-from services.data_parser import parse_response_json
-from services.preprocess import preprocess_dataframe
-from services.llm_analyzer import run_overall_analysis_agent
+import asyncio
 from models.analysis_schema import OverallAnalysisResponse
 from typing import Optional
-from config.config_manager import load_system_definition
+from config.config_manager import current_config
 
 router = APIRouter()
 
 @router.post("/analyze-request", response_model=OverallAnalysisResponse)
 async def analyze_request(
+    background_tasks: BackgroundTasks,
     request_file: UploadFile = File(...),
     system: Optional[str] = Form(None),
+    bypass_llm_cache: bool = Form(False),
 ):
+    # Imported on first use so the backend answers /api/ping without loading pandas and openai
+    from services.konom_query import fetch_data_async
+    from services.data_parser import parse_response_json
+    from services.preprocess import preprocess_dataframe
+    from services.llm_analyzer import run_overall_analysis_agent
+    from services.result_store import record_result
     try:
         print(" Reading uploaded file...")
         content = await request_file.read()
@@ -27,10 +32,13 @@ async def analyze_request(
             print(" Failed to parse uploaded JSON.")
             raise HTTPException(status_code=400, detail="Invalid JSON file uploaded.")
 
+        # One config version for the whole request
+        config = current_config()
+
         # Fetch system from YAML if not provided
         if system is None:
             print(" System not provided via form. Attempting to infer from YAML...")
-            system_def = load_system_definition.__wrapped__(None)  # loads as dict
+            system_def = config.system_definition
             if len(system_def) == 1:
                 system = list(system_def.keys())[0]
                 print(f" Inferred system: {system}")
@@ -42,7 +50,7 @@ async def analyze_request(
         # Fetch Konom data
         try:
             print(" Fetching data from Konom API...")
-            konom_response = fetch_data(request_json)
+            konom_response = await fetch_data_async(request_json)
             print(" Konom data received.")
         except Exception as e:
             print(f" Konom fetch failed: {e}")
@@ -51,7 +59,7 @@ async def analyze_request(
         # Parse JSON into DataFrame
         try:
             print(" Parsing response JSON into DataFrame...")
-            parsed_df = parse_response_json(konom_response)
+            parsed_df = await asyncio.to_thread(parse_response_json, konom_response, config)
             print(f" Parsed DataFrame with columns: {list(parsed_df.columns)}")
         except Exception as e:
             print(f" Parsing response failed: {e}")
@@ -60,7 +68,7 @@ async def analyze_request(
         # Preprocess DataFrame
         try:
             print(" Preprocessing DataFrame...")
-            processed_df = preprocess_dataframe(parsed_df)
+            processed_df = await asyncio.to_thread(preprocess_dataframe, parsed_df, config)
             print(f" DataFrame shape after preprocessing: {processed_df.shape}")
         except Exception as e:
             print(f" Preprocessing failed: {e}")
@@ -69,12 +77,15 @@ async def analyze_request(
         # LLM-based analysis
         try:
             print(" Sending data to LLM for overall analysis...")
-            verdict = run_overall_analysis_agent(processed_df, system)
+            verdict = await run_overall_analysis_agent(processed_df, system, bypass_llm_cache=bypass_llm_cache, config=config)
             print(" LLM analysis completed.")
         except Exception as e:
             print(f" LLM analysis failed: {e}")
             raise HTTPException(status_code=500, detail=f"LLM analysis failed: {e}")
 
+        # Keep it, so reopening this experiment needs neither Konom nor the LLM; stored after
+        # the response is sent (record_result logs its own failures)
+        background_tasks.add_task(record_result, "analyze", request_json, system, [], processed_df, verdict, config.version)
         return verdict
 
     except HTTPException as e:
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+router = APIRouter()
+
+@router.get("/cache-stats")
+def cache_stats():
+    from services.konom_query import konom_cache, konom_flight
+    from utils.llm_utils import llm_cache
+    from services.result_store import result_store
+    from services.frame_snapshots import frame_snapshots
+    return {
+        "konom": konom_cache.stats(),
+        "konom_single_flight": konom_flight.stats(),
+        "llm": llm_cache.stats(),
+        "frame_snapshots": frame_snapshots.stats(),
+        "results": result_store.stats(),
+    }
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, UploadFile, HTTPException
 import os
 from utils.file_saver import save_uploaded_file_sync
-from config.config_manager import CONFIG_DIR
+from config.config_manager import CONFIG_DIR, config_registry
 
 router = APIRouter()
 
@@ -20,7 +20,10 @@ async def upload_config(file: UploadFile):
         
         saved_path = save_uploaded_file_sync(file, CONFIG_DIR)
         print(f"[UPLOAD CONFIG] File saved to: {saved_path}")
-        return {"message": f"File {file.filename} uploaded successfully."}
+        # Re-read now rather than trusting the mtime, which may not have moved
+        config_registry.invalidate()
+        version = config_registry.snapshot().version
+        return {"message": f"File {file.filename} uploaded successfully.", "config_version": version}
     except Exception as e:
         print(f"[UPLOAD CONFIG] Error: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
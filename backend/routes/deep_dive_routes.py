@@ -1,28 +1,96 @@
-from fastapi import APIRouter, HTTPException
-from models.analysis_schema import DeepDiveQuery, DeepDiveResponse
-from services.konom_query import fetch_data
-from services.data_parser import parse_response_json
-from services.preprocess import preprocess_dataframe
-from services.agent_runner import run_deep_dive_agent
+import json
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from models.analysis_schema import DeepDiveQuery, DeepDiveResponse, DeepDiveSegment
+from config.config_manager import current_config
 
 router = APIRouter()
 
 @router.post("/deep-dive-query", response_model=DeepDiveResponse)
-async def deep_dive_query(payload: DeepDiveQuery):
+async def deep_dive_query(payload: DeepDiveQuery, background_tasks: BackgroundTasks):
+    # Imported on first use so the backend answers /api/ping without loading pandas and openai
+    from services.konom_query import build_deep_dive_request
+    from services.data_loader import RequestMemo, load_prepared_frame_async
+    from services.agent_runner import run_deep_dive_agent
+    from services.result_store import record_result
     try:
-        # Modify request_json to include group_by
-        request_json = dict(payload.request_json)
-        request_json['group_by'] = payload.dimensions
-
-        # Fetch grouped data
-        response_json = fetch_data(request_json)
-        df = parse_response_json(response_json)
-        df = preprocess_dataframe(df)
+        # Fetch and prepare the grouped data once; the agent reuses it with the same config
+        memo = RequestMemo()
+        config = current_config()
+        request_json = build_deep_dive_request(payload.request_json, payload.dimensions)
+        df = await load_prepared_frame_async(request_json, memo, config)
 
         # Run deep dive agent
-        result = run_deep_dive_agent(request_json, payload.system, payload.dimensions)
+        result = await run_deep_dive_agent(
+            request_json, payload.system, payload.dimensions, df=df, memo=memo,
+            bypass_llm_cache=payload.bypass_llm_cache, config=config,
+        )
+        # Stored after the response is sent; record_result logs its own failures
+        background_tasks.add_task(
+            record_result, "deep_dive", payload.request_json, payload.system, payload.dimensions, df, result, config.version
+        )
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Deep dive analysis failed: {e}") 
+        raise HTTPException(status_code=500, detail=f"Deep dive analysis failed: {e}")
+
+@router.post("/deep-dive-query/stream")
+async def deep_dive_query_stream(payload: DeepDiveQuery, background_tasks: BackgroundTasks):
+    """
+    NDJSON variant of /deep-dive-query: one {"type": "segment", "segment": ...} line per
+    segment as soon as its analysis finishes, then a final {"type": "overall", ...} line.
+    Failures are sent as {"type": "error", "detail": ...}, since the status code has
+    already gone out by then.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_segment(segment: dict):
+        try:
+            event = {"type": "segment", "segment": jsonable_encoder(DeepDiveSegment(**segment))}
+        except Exception as e:
+            event = {"type": "error", "segment": segment.get("segment"), "detail": f"Invalid segment result: {e}"}
+        await events.put(event)
+
+    async def run():
+        from services.konom_query import build_deep_dive_request
+        from services.data_loader import RequestMemo, load_prepared_frame_async
+        from services.agent_runner import run_deep_dive_agent
+        from services.result_store import record_result
+        try:
+            memo = RequestMemo()
+            config = current_config()
+            request_json = build_deep_dive_request(payload.request_json, payload.dimensions)
+            df = await load_prepared_frame_async(request_json, memo, config)
+            result = await run_deep_dive_agent(
+                request_json, payload.system, payload.dimensions, df=df, memo=memo,
+                bypass_llm_cache=payload.bypass_llm_cache, on_segment=on_segment, config=config,
+            )
+            await events.put({
+                "type": "overall",
+                "overall_commentary": result["overall_commentary"],
+                "prompt_report": result["prompt_report"],
+            })
+            # Runs once the stream has closed, as the response's background task
+            background_tasks.add_task(
+                record_result, "deep_dive", payload.request_json, payload.system, payload.dimensions, df, result, config.version
+            )
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await events.put({"type": "error", "detail": f"Deep dive analysis failed: {detail}"})
+        finally:
+            await events.put(None)
+
+    async def stream():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield json.dumps(event) + "\n"
+        finally:
+            # Client went away: stop paying for segments nobody will read
+            task.cancel()
 
-        
\ No newline at end of file
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
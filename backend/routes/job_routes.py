@@ -0,0 +1,119 @@
+import json
+import asyncio
+import hashlib
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse
+from models.analysis_schema import DeepDiveQuery, DeepDiveResponse
+from services.job_queue import job_queue, Job, DONE, FAILED, CANCELLED
+from config.config_manager import current_config
+
+router = APIRouter()
+
+def job_key(kind: str, request_json: dict, **params) -> str:
+    """Identical submissions (same Konom query and parameters) share one in-flight job."""
+    from services.konom_query import canonical_request_key
+    payload = json.dumps({"kind": kind, "request": canonical_request_key(request_json), **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def submitted(job: Job, deduplicated: bool) -> dict:
+    return {"job_id": job.id, "status": job.status, "deduplicated": deduplicated}
+
+@router.post("/jobs/deep-dive")
+async def submit_deep_dive_job(payload: DeepDiveQuery):
+    # The job runs on the config as it was at submission, whatever is uploaded meanwhile
+    config = current_config()
+
+    async def run(job: Job):
+        # Imported on first use so the backend answers /api/ping without loading pandas and openai
+        from services.konom_query import build_deep_dive_request
+        from services.data_loader import RequestMemo, load_prepared_frame_async
+        from services.agent_runner import run_deep_dive_agent
+        from services.result_store import record_result
+        memo = RequestMemo()
+        request_json = build_deep_dive_request(payload.request_json, payload.dimensions)
+        df = await load_prepared_frame_async(request_json, memo, config)
+        try:
+            total = await asyncio.to_thread(
+                lambda: df.groupby(payload.dimensions, sort=False, dropna=False, observed=True).ngroups
+            )
+        except KeyError:
+            total = 0  # the agent reports the missing dimension
+        job.set_progress(done=0, total=total)
+
+        async def on_segment(segment: dict):
+            job.set_progress(done=job.done + 1)
+
+        result = await run_deep_dive_agent(
+            request_json, payload.system, payload.dimensions, df=df, memo=memo,
+            bypass_llm_cache=payload.bypass_llm_cache, on_segment=on_segment, config=config,
+        )
+        await asyncio.to_thread(
+            record_result, "deep_dive", payload.request_json, payload.system, payload.dimensions, df, result, config.version
+        )
+        # Same shape as /deep-dive-query
+        return DeepDiveResponse(**result)
+
+    key = job_key("deep_dive", payload.request_json, system=payload.system, dimensions=payload.dimensions,
+                  bypass_llm_cache=payload.bypass_llm_cache, config_version=config.version)
+    return submitted(*job_queue.submit("deep_dive", key, run))
+
+@router.post("/jobs/analyze")
+async def submit_analyze_job(
+    request_file: UploadFile = File(...),
+    system: Optional[str] = Form(None),
+    bypass_llm_cache: bool = Form(False),
+):
+    try:
+        request_json = json.loads(await request_file.read())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON file uploaded.")
+
+    config = current_config()
+    if system is None:
+        system_def = config.system_definition
+        if len(system_def) == 1:
+            system = list(system_def.keys())[0]
+        else:
+            raise HTTPException(status_code=400, detail="System not provided and could not be inferred.")
+
+    async def run(job: Job):
+        from services.data_loader import load_prepared_frame_async
+        from services.llm_analyzer import run_overall_analysis_agent
+        from services.result_store import record_result
+        job.set_progress(done=0, total=1)
+        df = await load_prepared_frame_async(request_json, config=config)
+        verdict = await run_overall_analysis_agent(df, system, bypass_llm_cache=bypass_llm_cache, config=config)
+        await asyncio.to_thread(record_result, "analyze", request_json, system, [], df, verdict, config.version)
+        job.set_progress(done=1)
+        return verdict
+
+    key = job_key("analyze", request_json, system=system, bypass_llm_cache=bypass_llm_cache, config_version=config.version)
+    return submitted(*job_queue.submit("analyze", key, run))
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status == DONE:
+        return job.result
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail="Job was cancelled.")
+    # Still queued or running: poll again later
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    get_job_or_404(job_id)
+    return job_queue.cancel(job_id).to_dict()
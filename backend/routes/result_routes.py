@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+
+router = APIRouter()
+
+@router.get("/results")
+async def list_results(
+    experiment_token: Optional[str] = None,
+    provider: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    system: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 50,
+):
+    """Stored analyses, newest first, filtered by experiment token, provider and time window."""
+    from services.result_store import result_store
+    try:
+        results = await asyncio.to_thread(
+            result_store.search, experiment_token, provider, start, end, system, kind, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+@router.get("/results/{result_id}")
+async def get_result(result_id: str, include_frame: bool = False):
+    """A stored analysis: its request, the verdicts and, with include_frame, the data as records."""
+    from services.result_store import result_store
+    stored = await asyncio.to_thread(result_store.get, result_id, include_frame)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Unknown result: {result_id}")
+    return stored
+
+@router.delete("/results/{result_id}")
+async def delete_result(result_id: str):
+    from services.result_store import result_store
+    if not await asyncio.to_thread(result_store.delete, result_id):
+        raise HTTPException(status_code=404, detail=f"Unknown result: {result_id}")
+    return {"deleted": result_id}
@@ -4,17 +4,27 @@
 
 import os
 import json
-import copy
-from typing import List, Dict, Any
+import asyncio
+import logging
+from functools import cached_property
+from typing import List, Dict, Any, Awaitable, Callable, Optional
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException
-import openai
-from config.config_manager import load_yaml
-from services.konom_query import fetch_data
-from services.data_parser import parse_response_json
-from services.preprocess import preprocess_dataframe
-from services.konom_query import fetch_deep_dive_data
+from config.config_manager import ConfigSnapshot, current_config
+from services.konom_query import build_deep_dive_request
+from services.data_loader import RequestMemo, load_prepared_frame_async
 from services.utils import enhance_with_percentage_changes
+from services.segment_executor import SegmentExecutor
+from services.prompt_builder import PromptReport, compact_json, count_tokens, fit_table, metric_definitions, plan_batches, select_columns
+from utils.llm_utils import LLM_CACHE_ENABLED, cached_completion, complete_prompt, safe_parse_llm_json, store_completion
+
+logger = logging.getLogger(__name__)
+
+# Segments packed into one LLM call: at most DEEP_DIVE_MAX_BATCH (1 turns batching off),
+# with their metric tables adding up to no more than DEEP_DIVE_BATCH_TOKENS
+DEEP_DIVE_MAX_BATCH = int(os.getenv("DEEP_DIVE_MAX_BATCH", "8"))
+DEEP_DIVE_BATCH_TOKENS = int(os.getenv("DEEP_DIVE_BATCH_TOKENS", "4000"))
 
 def format_metrics(metrics_data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Convert raw metrics data into the expected format."""
@@ -30,77 +40,320 @@ def format_metrics(metrics_data: Dict[str, Any]) -> List[Dict[str, Any]]:
             })
     return formatted_metrics
 
-def run_deep_dive_agent(
+async def run_deep_dive_agent(
     original_request_json: dict,
     system: str,
     dimensions: List[str],
-    threshold: int = 10
+    threshold: int = 10,
+    llm_client: Any = None,
+    executor: Optional[SegmentExecutor] = None,
+    df: Optional[pd.DataFrame] = None,
+    memo: Optional[RequestMemo] = None,
+    bypass_llm_cache: bool = False,
+    max_batch: int = DEEP_DIVE_MAX_BATCH,
+    on_segment: Optional[Callable[[dict], Awaitable[None]]] = None,
+    config: Optional[ConfigSnapshot] = None,
 ) -> dict:
-    # 1. Deep copy request
-    request_json = copy.deepcopy(original_request_json)
+    # One config version for the whole run, even if a file is uploaded meanwhile
+    config = config or current_config()
 
-    # 2. Update 'rows' and 'dimensionObjectList' with selected dimensions
-    rows = request_json.get("rows", [])
-    dim_objects = request_json.get("dimensionObjectList", [])
-    existing_row_dims = [r.get("dimension") for r in rows]
-    existing_obj_dims = [o.get("dimension") for o in dim_objects]
+    # 1. Build the deep-dive request ('rows' and 'dimensionObjectList' gain the selected dimensions)
+    request_json = build_deep_dive_request(original_request_json, dimensions, threshold)
 
-    for dim in dimensions:
-        new_entry = {"dimension": dim, "outputName": dim, "threshold": str(threshold)}
+    # 2. Fetch and prepare API data, unless the caller already did
+    if df is None:
+        try:
+            df = await load_prepared_frame_async(request_json, memo, config)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"API fetch failed: {e}")
 
-        if dim not in existing_row_dims:
-            insert_idx = next((i for i, r in enumerate(rows) if r.get("dimension") == "Experiment Tokens"), len(rows))
-            rows.insert(insert_idx, new_entry)
+    if not dimensions:
+        raise HTTPException(status_code=400, detail="No dimensions provided for deep dive.")
+    if executor is None:
+        executor = SegmentExecutor()
+
+    # 3-5. pandas work runs in a worker thread so the event loop stays free
+    prompts, segment_jobs = await asyncio.to_thread(build_segment_jobs, df, system, dimensions, config)
 
-        if dim not in existing_obj_dims:
-            dim_objects.append(new_entry)
+    # Each segment is cached on its own prompt, so a re-run only pays for segments that changed
+    use_cache = LLM_CACHE_ENABLED and not bypass_llm_cache
+    built: Dict[str, dict] = {}
 
-    request_json["rows"] = rows
-    request_json["dimensionObjectList"] = dim_objects
+    async def on_answer(job: SegmentJob, answer: Any):
+        built[job.segment_name] = build_segment_result(job.segment_name, job.metrics_table, answer)
+        # Streaming callers get each segment as soon as it is ready, in completion order
+        if on_segment is not None:
+            await on_segment(built[job.segment_name])
 
-    # Remove 'group_by' if present before sending to fetch_deep_dive_data
-    request_json.pop("group_by", None)
+    await analyze_segments(prompts, segment_jobs, llm_client, executor, use_cache, max_batch, on_answer)
+    segments = [built[job.segment_name] for job in segment_jobs]
 
-    # 3. Fetch API data
+    # 6. Overall summary; the prompt report is tokenized in a worker thread meanwhile
+    prompt = prompts.overall(segments)
+    report_task = asyncio.create_task(asyncio.to_thread(prompts.report.summary))
     try:
-        response_json = fetch_deep_dive_data(request_json, dimensions, threshold)
+        content = (await complete_prompt(llm_client, prompt, executor.call_timeout, use_cache=use_cache, cache_if=json.loads)).strip()
+        try:
+            overall_commentary = json.loads(content)
+            if not isinstance(overall_commentary, list):
+                overall_commentary = [str(overall_commentary)]
+        except Exception:
+            overall_commentary = [content]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"API fetch failed: {e}")
+        overall_commentary = [f"LLM summary failed: {e}"]
+
+    prompt_report = await report_task
+    logger.info(f"Deep dive prompt tokens: {prompt_report}")
+    return {
+        "segments": segments,
+        "overall_commentary": overall_commentary,
+        "prompt_report": prompt_report,
+    }
 
-    df = parse_response_json(response_json)
-    df = preprocess_dataframe(df)
+async def analyze_segments(
+    prompts: "DeepDivePrompts",
+    segment_jobs: List["SegmentJob"],
+    llm_client: Any,
+    executor: SegmentExecutor,
+    use_cache: bool,
+    max_batch: int = DEEP_DIVE_MAX_BATCH,
+    on_answer: Optional[Callable[["SegmentJob", Any], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    LLM answer (or the exception) per segment name. Cached segments are answered from the
+    cache; the rest are packed into batches that share one preamble. A batch whose reply
+    is malformed or misses segments is split in half and the missing segments retried,
+    down to single-segment prompts; a batch whose call failed outright gives every one
+    of its segments that exception. Answers taken out of a batch are cached under the
+    segment's own prompt, so later runs hit them whether or not they batch.
+    on_answer(job, answer) is awaited as soon as each segment's final answer is known.
+    """
+    results: Dict[str, Any] = {}
+
+    async def settle(job: SegmentJob, answer: Any):
+        results[job.segment_name] = answer
+        if on_answer is not None:
+            await on_answer(job, answer)
+
+    pending = []
+    for job in segment_jobs:
+        cached = await cached_completion(prompts.segment(job)) if use_cache else None
+        if cached is not None:
+            await settle(job, cached)
+        else:
+            pending.append(job)
+
+    async def analyze_batch(batch: List[SegmentJob]):
+        if len(batch) == 1:
+            prompt = prompts.segment(batch[0])
+            prompts.record(batch, prompt)
+            return await complete_prompt(llm_client, prompt, executor.call_timeout, use_cache=use_cache, cache_if=json.loads)
+        prompt = prompts.batch(batch)
+        prompts.record(batch, prompt)
+        content = await complete_prompt(llm_client, prompt, executor.call_timeout, use_cache=False)
+        return parse_batch_response(content, [job.segment_name for job in batch])
+
+    batches = prompts.plan(pending, max_batch)
+    while batches:
+        retry = []
+
+        async def handle(index: int, outcome: Any):
+            batch = batches[index]
+            if len(batch) == 1:
+                await settle(batch[0], outcome)
+                return
+            if isinstance(outcome, Exception) and not isinstance(outcome, ValueError):
+                # A timeout or rate limit the executor already retried; splitting would only multiply the calls
+                logger.warning(f"Batch of {len(batch)} segments failed ({type(outcome).__name__}: {outcome})")
+                for job in batch:
+                    await settle(job, outcome)
+                return
+            answered = outcome if isinstance(outcome, dict) else {}
+            if not answered:
+                logger.warning(f"Batch of {len(batch)} segments got a malformed reply ({outcome}), splitting it")
+            missing = []
+            for job in batch:
+                if job.segment_name not in answered:
+                    missing.append(job)
+                    continue
+                content = json.dumps(answered[job.segment_name])
+                if use_cache:
+                    await store_completion(prompts.segment(job), content)
+                await settle(job, content)
+            if missing:
+                half = (len(missing) + 1) // 2 if len(missing) == len(batch) else len(missing)
+                retry.extend(missing[i:i + half] for i in range(0, len(missing), half))
+
+        # Batches run concurrently; each retry round only carries what is still unanswered
+        await executor.map(analyze_batch, batches, on_result=handle)
+        batches = retry
+    return results
+
+def parse_batch_response(content: str, segment_names: List[str]) -> Dict[str, dict]:
+    """
+    Maps a batched reply back to its segments. Items are matched on their "segment" field,
+    or by position when the model rewrote every name but kept the count and order.
+    Raises ValueError when the reply is not a JSON array of objects.
+    """
+    parsed = safe_parse_llm_json(content.strip())
+    if isinstance(parsed, dict):
+        parsed = parsed.get("segments")
+    if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+        raise ValueError("Batch response is not a JSON array of segment objects")
+    wanted = set(segment_names)
+    answered = {item["segment"]: item for item in parsed if item.get("segment") in wanted}
+    if not answered and len(parsed) == len(segment_names):
+        answered = dict(zip(segment_names, parsed))
+    return answered
+
+class SegmentJob:
+    """
+    One dimension combination of the deep-dive frame. Holds only the row positions of
+    the segment; its records are assembled from the shared column lists on first use.
+    """
+
+    def __init__(self, segment_name: str, positions: np.ndarray, columns: List[str], values: List[list]):
+        self.segment_name = segment_name
+        self.positions = positions
+        self.columns = columns
+        self.values = values
+
+    @cached_property
+    def metrics_table(self) -> List[Dict[str, Any]]:
+        rows = zip(*([col[i] for i in self.positions] for col in self.values))
+        return [dict(zip(self.columns, row)) for row in rows]
+
+
+def _rounded(values: pd.Series) -> list:
+    # float32 measures are widened first, so 0.1 does not come out as 0.10000000149
+    if values.dtype.kind == "f" and values.dtype.itemsize < 8:
+        values = values.astype(np.float64)
+    return values.round(2).tolist()
+
+
+def split_segments(df: pd.DataFrame, dimensions: List[str]) -> List[SegmentJob]:
+    """
+    Splits the frame into segments with a single groupby, in order of first appearance.
+    Rounding and conversion to Python values happen once for the whole frame.
+    """
+    codes = df.groupby(dimensions, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(codes))[:-1]) if len(codes) else []
+
+    columns = list(df.columns)
+    values = [_rounded(df[col]) if df[col].dtype.kind in "iufc" else df[col].tolist() for col in columns]
+    keys = [df[dim].tolist() for dim in dimensions]
+
+    jobs = []
+    for positions in groups:
+        first = positions[0]
+        segment_name = ', '.join([f"{dim} = {key[first]}" for dim, key in zip(dimensions, keys)])
+        jobs.append(SegmentJob(segment_name, positions, columns, values))
+    return jobs
+
+
+class DeepDivePrompts:
+    """
+    Renders the deep-dive prompts from one config snapshot. Configs go in as
+    compact JSON (only this system's definition), metric tables as CSV restricted to the
+    dimension and configured metric columns and fitted to PROMPT_TOKEN_BUDGET. The report
+    compares every prompt with the indented-JSON encoding it replaces.
+    """
+
+    def __init__(self, system: str, config: ConfigSnapshot, columns: List[str], all_columns: List[str]):
+        system_def = config.system_definition
+        deep_dive_config = config.deep_dive_config
+        definitions = metric_definitions(config.metric_config, columns)
+
+        self.columns = columns
+        self.columns_dropped = len(all_columns) - len(columns)
+        self.report = PromptReport()
+        self._tables: Dict[str, Any] = {}
+        self._recorded = set()
+        self.preamble = f"""
+System: {system}
+System Definition: {compact_json(system_def.get(system, system_def))}
+Deep Dive Config: {compact_json(deep_dive_config)}
+Metric Definitions: {compact_json(definitions)}"""
+        # What the prompts carried before compaction, for the tokens-saved report
+        self.baseline_preamble = f"""
+System: {system}
+System Definition: {json.dumps(system_def, indent=2)}
+Deep Dive Config: {json.dumps(deep_dive_config, indent=2)}"""
+
+    def table(self, job: "SegmentJob"):
+        """(CSV table, rows dropped to fit the budget) for a segment, encoded once."""
+        if job.segment_name not in self._tables:
+            self._tables[job.segment_name] = fit_table(job.metrics_table, self.columns)
+        return self._tables[job.segment_name]
+
+    def segment(self, job: "SegmentJob") -> str:
+        table, _ = self.table(job)
+        return segment_prompt(self.preamble, job.segment_name, f"Metric Table (CSV):\n{table}")
+
+    def batch(self, jobs: List["SegmentJob"]) -> str:
+        blocks = [f"Segment: {job.segment_name}\nMetric Table (CSV):\n{self.table(job)[0]}" for job in jobs]
+        return batch_prompt(self.preamble, len(jobs), "\n\n".join(blocks))
+
+    def plan(self, jobs: List["SegmentJob"], max_batch: int) -> List[List["SegmentJob"]]:
+        """Groups segments into batches sized by their table tokens (DEEP_DIVE_BATCH_TOKENS)."""
+        if max_batch <= 1:
+            return [[job] for job in jobs]
+        costs = [count_tokens(self.table(job)[0]) for job in jobs]
+        return plan_batches(jobs, costs, DEEP_DIVE_BATCH_TOKENS, max_batch)
+
+    def record(self, jobs: List["SegmentJob"], prompt: str):
+        """
+        Adds a sent prompt to the report, against one old-style prompt per segment it covers.
+        Segments re-sent after a failed batch only count towards the baseline once.
+        """
+        fresh = [job for job in jobs if job.segment_name not in self._recorded]
+        self._recorded.update(job.segment_name for job in fresh)
+        rows_dropped = sum(self.table(job)[1] for job in fresh)
+        self.report.record(lambda: "".join(
+            segment_prompt(self.baseline_preamble, job.segment_name, f"Metric Table:\n{json.dumps(job.metrics_table, indent=2)}")
+            for job in fresh
+        ), prompt, rows_dropped, self.columns_dropped)
+
+    def overall(self, segments: List[Dict[str, Any]]) -> str:
+        prompt = overall_prompt(self.preamble, compact_json(segments))
+        self.report.record(lambda: overall_prompt(self.baseline_preamble, json.dumps(segments, indent=2)), prompt)
+        return prompt
+
+def build_segment_jobs(df: pd.DataFrame, system: str, dimensions: List[str], config: Optional[ConfigSnapshot] = None):
+    """Adds % change columns and splits the frame into segment jobs."""
+    # 3. Add % change columns (on a copy, the prepared frame may be shared)
     if 'Experiment Tokens' in df.columns:
-        df = enhance_with_percentage_changes(df)
+        df = enhance_with_percentage_changes(df.copy(), group_cols=dimensions)
         for col in df.columns:
             if col.startswith('% Change in '):
                 df[col] = df[col].apply(lambda x: f"{x}" if not x else (x if x.endswith('%') else f"{float(x.replace('%','')):.2f}%" if isinstance(x, str) and x.replace('%','').replace('.','',1).replace('+','',1).replace('-','',1).isdigit() else x))
 
-    # 4. Load configs
-    system_def = load_yaml(os.path.join('configs', 'system_definition.yaml'))
-    deep_dive_config = load_yaml(os.path.join('configs', 'deep_dive_config.yaml'))
-    metric_config = load_yaml(os.path.join('configs', 'metric_config.yaml'))
-    metric_defs = {m['name']: m.get('definition', '') for m in metric_config.get('metrics', [])}
+    # 4. Prompts only carry the dimensions and metrics defined in metric_config
+    config = config or current_config()
+    columns = select_columns(list(df.columns), config.metric_config, keep=dimensions)
+    prompts = DeepDivePrompts(system, config, columns, list(df.columns))
 
-    # 5. Segment-level analysis
-    if not dimensions:
-        raise HTTPException(status_code=400, detail="No dimensions provided for deep dive.")
-    segment_keys = df[dimensions].drop_duplicates().to_dict(orient='records')
-    segments = []
+    # 5. One pass over the frame; prompts are rendered per segment as it is dispatched
+    return prompts, split_segments(df, dimensions)
 
-    for seg in segment_keys:
-        mask = (df[list(seg)] == pd.Series(seg)).all(axis=1)
-        seg_df = df[mask]
-        metrics_table = seg_df.round(2).to_dict(orient='records')
-        segment_name = ', '.join([f"{k} = {v}" for k, v in seg.items()])
+def overall_prompt(preamble: str, segments_text: str) -> str:
+    return f"""{preamble}
+Segments: {segments_text}
 
-        prompt = f"""
-System: {system}
-System Definition: {json.dumps(system_def, indent=2)}
-Deep Dive Config: {json.dumps(deep_dive_config, indent=2)}
+Instructions:
+Summarize the key patterns and insights across all segments in 2-4 concise, analytical, and number-driven bullet points.
+- Each bullet should be a single, crisp sentence.
+- Focus on the most important findings and avoid repetition.
+- Do NOT return a paragraph or prose, only a JSON array of strings, e.g. ["...", "..."]
+- Be specific with numbers and metrics.
+Return only the JSON array of bullet points, nothing else.
+"""
+
+def segment_prompt(preamble: str, segment_name: str, table: str) -> str:
+    return f"""{preamble}
 Segment: {segment_name}
-Metric Table:
-{json.dumps(metrics_table, indent=2)}
-Metric Definitions: {json.dumps(metric_defs, indent=2)}
+{table}
 
 Instructions:
 Analyze this segment and return a JSON with:
@@ -130,77 +383,79 @@ Instructions for scalability_verdict:
 
 Be concise, analytical, and number-driven. Write in complete sentences.
 """
-        try:
-            openai.api_key = os.environ.get("OPENAI_API_KEY")
-            response = openai.chat.completions.create(
-                model="o3-mini",
-                messages=[{"role": "user", "content": prompt}],
-            )
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
-            parsed = clean_segment_fields(parsed)
-            # Fallback for scalability_verdict if it's a string
-            sv = parsed.get("scalability_verdict", {})
-            if isinstance(sv, str):
-                verdict = sv.split('-')[0].strip() if '-' in sv else sv.strip()
-                reasons = [r.strip() for r in sv.split('•') if r.strip()]
-                if len(reasons) == 0:
-                    reasons = [sv]
-                parsed["scalability_verdict"] = {"verdict": verdict, "reasons": reasons}
-            segments.append({
-                "segment": segment_name,
-                "metrics": parsed.get("metrics"),
-                "key_insights": parsed.get("key_insights", []),
-                "final_verdict": parsed.get("final_verdict", ""),
-                "scalability_verdict": parsed.get("scalability_verdict", {"verdict": "", "reasons": []}),
-                "insight": parsed.get("insight", parsed.get("summary", ""))
-            })
-        except Exception as e:
-            metrics = format_metrics(metrics_table[0] if metrics_table else {})
-            segments.append({
-                "segment": segment_name,
-                "metrics": metrics,
-                "key_insights": [],
-                "final_verdict": "",
-                "scalability_verdict": {"verdict": "", "reasons": []},
-                "insight": ""
-            })
 
-    # 6. Overall summary
-    overall_prompt = f"""
-System: {system}
-System Definition: {json.dumps(system_def, indent=2)}
-Deep Dive Config: {json.dumps(deep_dive_config, indent=2)}
-Segments: {json.dumps(segments, indent=2)}
+def batch_prompt(preamble: str, count: int, segment_blocks: str) -> str:
+    return f"""{preamble}
+The {count} segments below each have their own metric table.
+
+{segment_blocks}
 
 Instructions:
-Summarize the key patterns and insights across all segments in 2-4 concise, analytical, and number-driven bullet points.
-- Each bullet should be a single, crisp sentence.
-- Focus on the most important findings and avoid repetition.
-- Do NOT return a paragraph or prose, only a JSON array of strings, e.g. ["...", "..."]
-- Be specific with numbers and metrics.
-Return only the JSON array of bullet points, nothing else.
+Analyze every segment on its own and return a JSON array with exactly one object per segment, in the order given:
+[
+  {{{{
+    "segment": "segment name exactly as written after 'Segment:'",
+    "metrics": [
+      {{{{
+        "name": "metric_name",
+        "value": numeric_value,
+        "baseline": baseline_value,
+        "change": change_percentage,
+        "significance": "positive" | "negative" | "neutral"
+      }}}}
+    ],
+    "key_insights": ["string", ...],
+    "final_verdict": "string (format: 'Final Verdict: <cohort name> is best overall')",
+    "scalability_verdict": {{{{
+      "verdict": "Scale" | "Hold" | "Avoid",
+      "reasons": ["string (concise, number-driven)", ...]
+    }}}}
+  }}}}
+]
+
+Instructions for scalability_verdict:
+- The 'scalability_verdict' field MUST be a JSON object with exactly two fields: 'verdict' (string: Scale, Hold, or Avoid) and 'reasons' (array of 1–2 concise, number-driven bullet points).
+- Do NOT return a string, markdown, or prose. Only return a valid JSON array as specified.
+- If you do not know, use: {{{{"verdict": "", "reasons": []}}}}
+- The 'reasons' array should contain 1-2 bullets only.
+
+Be concise, analytical, and number-driven. Write in complete sentences.
 """
+
+def build_segment_result(segment_name: str, metrics_table: List[Dict[str, Any]], result: Any) -> dict:
+    """Turns one segment's LLM output (or the exception it raised) into a segment dict."""
     try:
-        openai.api_key = os.environ.get("OPENAI_API_KEY")
-        response = openai.chat.completions.create(
-            model="o3-mini",
-            messages=[{"role": "user", "content": overall_prompt}],
-        )
-        content = response.choices[0].message.content.strip()
-        try:
-            overall_commentary = json.loads(content)
-            if not isinstance(overall_commentary, list):
-                overall_commentary = [str(overall_commentary)]
-        except Exception:
-            overall_commentary = [content]
+        if isinstance(result, BaseException):
+            raise result
+        parsed = json.loads(result)
+        parsed = clean_segment_fields(parsed)
+        # Fallback for scalability_verdict if it's a string
+        sv = parsed.get("scalability_verdict", {})
+        if isinstance(sv, str):
+            verdict = sv.split('-')[0].strip() if '-' in sv else sv.strip()
+            reasons = [r.strip() for r in sv.split('•') if r.strip()]
+            if len(reasons) == 0:
+                reasons = [sv]
+            parsed["scalability_verdict"] = {"verdict": verdict, "reasons": reasons}
+        return {
+            "segment": segment_name,
+            "metrics": parsed.get("metrics"),
+            "key_insights": parsed.get("key_insights", []),
+            "final_verdict": parsed.get("final_verdict", ""),
+            "scalability_verdict": parsed.get("scalability_verdict", {"verdict": "", "reasons": []}),
+            "insight": parsed.get("insight", parsed.get("summary", ""))
+        }
     except Exception as e:
-        overall_commentary = [f"LLM summary failed: {e}"]
-
-    return {
-        "segments": segments,
-        "overall_commentary": overall_commentary
-    }
+        logger.warning(f"Segment '{segment_name}' analysis failed: {e}")
+        metrics = format_metrics(metrics_table[0] if metrics_table else {})
+        return {
+            "segment": segment_name,
+            "metrics": metrics,
+            "key_insights": [],
+            "final_verdict": "",
+            "scalability_verdict": {"verdict": "", "reasons": []},
+            "insight": ""
+        }
 
 def clean_segment_fields(parsed):
     # Ensure 'insight' exists (copy summary if missing)
@@ -232,7 +487,7 @@ def clean_segment_fields(parsed):
 # import pandas as pd
 # from fastapi import HTTPException
 # import openai
-# from config.config_manager import load_yaml
+# from config.config_manager import ConfigSnapshot, current_config
 # from services.konom_query import fetch_data
 # from services.data_parser import parse_response_json
 # from services.preprocess import preprocess_dataframe
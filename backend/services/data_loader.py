@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional
+import pandas as pd
+from config.config_manager import ConfigSnapshot, current_config
+from services.konom_query import fetch_data, fetch_data_async, canonical_request_key
+from services.data_parser import parse_response_json
+from services.preprocess import preprocess_dataframe
+from services.frame_snapshots import FRAME_SNAPSHOTS_ENABLED, frame_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMemo:
+    """
+    Per-request memo of prepared DataFrames, keyed by the canonical Konom request hash.
+    Create one per HTTP request and pass it down so every step that needs the same
+    query shares a single fetch and parse.
+    """
+
+    def __init__(self):
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    def get_or_compute(self, request_json: dict, compute: Callable[[dict], pd.DataFrame]) -> pd.DataFrame:
+        key = canonical_request_key(request_json)
+        if key in self._frames:
+            logger.info(f"Reusing prepared data for request {key[:12]}")
+        else:
+            self._frames[key] = compute(request_json)
+        return self._frames[key]
+
+    async def aget_or_compute(self, request_json: dict, compute: Callable[[dict], Awaitable[pd.DataFrame]]) -> pd.DataFrame:
+        key = canonical_request_key(request_json)
+        if key in self._frames:
+            logger.info(f"Reusing prepared data for request {key[:12]}")
+        else:
+            self._frames[key] = await compute(request_json)
+        return self._frames[key]
+
+
+def fetch_and_prepare(request_json: dict, config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    """Fetches a Konom query and returns the parsed, preprocessed DataFrame, reusing its snapshot if one is stored."""
+    config = config or current_config()
+    df = load_snapshot(request_json, config)
+    if df is not None:
+        return df
+    return prepare_and_snapshot(request_json, fetch_data(request_json), config)
+
+
+def prepare_frame(response_json: dict, config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    """CPU-bound half of the pipeline: flatten the Konom response and preprocess it."""
+    config = config or current_config()  # both steps see the same config version
+    return preprocess_dataframe(parse_response_json(response_json, config), config)
+
+
+def load_snapshot(request_json: dict, config: ConfigSnapshot) -> Optional[pd.DataFrame]:
+    if not FRAME_SNAPSHOTS_ENABLED:
+        return None
+    df = frame_snapshots.get(request_json, config)
+    if df is not None:
+        logger.info(f"Loaded prepared data for request {canonical_request_key(request_json)[:12]} from its snapshot")
+    return df
+
+
+def prepare_and_snapshot(request_json: dict, response_json: dict, config: ConfigSnapshot) -> pd.DataFrame:
+    df = prepare_frame(response_json, config)
+    if FRAME_SNAPSHOTS_ENABLED:
+        frame_snapshots.put(request_json, config, df)
+    return df
+
+
+async def fetch_and_prepare_async(request_json: dict, config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    """Awaits the Konom fetch, then runs the pandas work in a worker thread off the event loop."""
+    config = config or current_config()
+    df = await asyncio.to_thread(load_snapshot, request_json, config)
+    if df is not None:
+        return df
+    response_json = await fetch_data_async(request_json)
+    return await asyncio.to_thread(prepare_and_snapshot, request_json, response_json, config)
+
+
+def load_prepared_frame(request_json: dict, memo: Optional[RequestMemo] = None, config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    if memo is None:
+        return fetch_and_prepare(request_json, config)
+    return memo.get_or_compute(request_json, partial(fetch_and_prepare, config=config))
+
+
+async def load_prepared_frame_async(
+    request_json: dict, memo: Optional[RequestMemo] = None, config: Optional[ConfigSnapshot] = None
+) -> pd.DataFrame:
+    if memo is None:
+        return await fetch_and_prepare_async(request_json, config)
+    return await memo.aget_or_compute(request_json, partial(fetch_and_prepare_async, config=config))
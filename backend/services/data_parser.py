@@ -1,42 +1,108 @@
+import numpy as np
 import pandas as pd
-import yaml
 import logging
-from typing import Dict, Any, List
-from config.config_manager import CONFIG_DIR
-import os
+import json
+from typing import Dict, Any, List, Optional, Set, Tuple
+from config.config_manager import ConfigSnapshot, current_config
+from services.metric_formulas import metric_key
+from utils import debug_capture
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-metric_config_path = os.path.join(CONFIG_DIR, "metric_config.yaml")
-print("[CONFIG LOAD] Looking for metric_config.yaml at:", metric_config_path)
-print("[CONFIG LOAD] Exists?", os.path.exists(metric_config_path))
-try:
-    with open(metric_config_path) as f:
-        METRIC_CONFIG = yaml.safe_load(f)
-except Exception as e:
-    print("[CONFIG LOAD] Failed to open metric_config.yaml:", e)
-    raise
-
-KNOWN_METRICS = list(METRIC_CONFIG.keys()) + ["Net Profit", "Cost"]
-extracted_rows = []
-
-def extract_deepest_data(data, path=None):
-    if path is None:
-        path = []
-    if 'split' not in data:
-        final_data = {**dict(path), **data}
-        extracted_rows.append(final_data)
-        return
-    for sub_data in data['split']:
-        current_path = path + [(k, v) for k, v in data.items() if not isinstance(v, (dict, list))]
-        extract_deepest_data(sub_data, current_path)
-
-def parse_response_json(response_data: Dict[str, Any]) -> pd.DataFrame:
-    import json
-    print("Raw API Response:", json.dumps(response_data, indent=2))
+MISSING = float("nan")
+
+# Label columns Konom always returns, on top of the configured deep-dive dimensions
+ID_DIMENSIONS = ["Provider Group Name", "Provider Name", "Experiment Tokens"]
+# Measures are float64 unless metric_config gives e.g. `dtype: float32`
+MEASURE_DTYPES = {"float32", "float64"}
+
+
+def flatten_split_tree(root: Dict[str, Any]) -> Tuple[Dict[str, List[Any]], int]:
+    """
+    Flattens a Konom 'split' tree into columns, one list per column, with one entry
+    per leaf. Each leaf row carries the scalar fields of every ancestor plus its own
+    fields (the leaf wins on a name clash). Columns appear in first-seen order and
+    rows lacking a column hold NaN, as pandas does for missing keys in records.
+
+    Iterative and reentrant: the walk uses an explicit stack and keeps no module state.
+    """
+    rows = []
+    stack = [(root, {})]
+    while stack:
+        node, path = stack.pop()
+        if 'split' not in node:
+            rows.append({**path, **node})
+            continue
+        child_path = {**path, **{k: v for k, v in node.items() if not isinstance(v, (dict, list))}}
+        stack.extend((child, child_path) for child in reversed(node['split']))
+
+    order: Dict[str, None] = {}
+    seen = None
+    for row in rows:
+        if row.keys() != seen:
+            seen = row.keys()
+            order.update(dict.fromkeys(seen))
+    return {k: [row.get(k, MISSING) for row in rows] for k in order}, len(rows)
+
+def dimension_columns(config: ConfigSnapshot) -> Set[str]:
+    try:
+        configured = config.deep_dive_config.get("valid_dimensions") or []
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"No deep-dive dimensions available for typing: {e}")
+        configured = []
+    return set(ID_DIMENSIONS) | {str(d).strip() for d in configured}
+
 
+def metric_dtypes(config: ConfigSnapshot) -> Dict[str, str]:
+    try:
+        metric_config = config.metric_config
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {
+        metric_key(name): spec["dtype"]
+        for name, spec in metric_config.items()
+        if isinstance(spec, dict) and spec.get("dtype") in MEASURE_DTYPES
+    }
+
+
+def typed_column(name: str, values: List[Any], dimensions: Set[str], dtypes: Dict[str, str]):
+    """
+    Dimensions become categoricals. Every other column that reads as numbers becomes a
+    float array of its configured dtype; text columns are categoricals too. Missing
+    values become 0, as the old fillna(0) did.
+    """
+    if name not in dimensions:
+        try:
+            nums = np.asarray(values, dtype=np.float64)
+        except (ValueError, TypeError):
+            nums = None
+        if nums is not None:
+            nums[np.isnan(nums)] = 0
+            return nums.astype(dtypes.get(metric_key(name), "float64"), copy=False)
+    labels = pd.Categorical(values)
+    if labels.isna().any():
+        if 0 not in labels.categories:
+            labels = labels.add_categories([0])
+        labels = labels.fillna(0)
+    return labels
+
+
+def typed_frame(columns: Dict[str, List[Any]], config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    """Schema-driven DataFrame from flattened columns: no object dtype for numbers."""
+    config = config or current_config()
+    names = [str(col).strip() for col in columns]
+    dimensions, dtypes = dimension_columns(config), metric_dtypes(config)
+    df = pd.DataFrame({
+        i: typed_column(name, values, dimensions, dtypes)
+        for i, (name, values) in enumerate(zip(names, columns.values()))
+    })
+    df.columns = names
+    return df
+
+
+def parse_response_json(response_data: Dict[str, Any], config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
     if "result" not in response_data:
         raise ValueError("No 'result' found in response")
 
@@ -51,38 +117,27 @@ def parse_response_json(response_data: Dict[str, Any]) -> pd.DataFrame:
         result = response_data.get('result', {})
         if not result:
             logger.error("No 'result' found in response")
-            logger.error(f"Full response with missing 'result': {json.dumps(response_data, indent=2)}")
+            if debug_capture.ENABLED:
+                debug_capture.capture("response_missing_result", json.dumps(response_data), force=True)
             raise ValueError("No 'result' found in response")
             
-        # Reset the global extracted_rows list
-        global extracted_rows
-        extracted_rows = []
+        # Flatten the split tree straight into columns
+        columns, n_rows = flatten_split_tree(result)
         
-        # Extract data using the existing function
-        extract_deepest_data(result)
-        
-        if not extracted_rows:
+        if not n_rows:
             logger.error("No data extracted from response")
             raise ValueError("No data extracted from response")
             
-        logger.info(f"Extracted {len(extracted_rows)} records from response")
+        logger.info(f"Extracted {n_rows} records from response")
 
-        # Convert to DataFrame
+        # Convert to a typed DataFrame; column names are stripped and missing values filled
         try:
-            df = pd.DataFrame(extracted_rows)
+            df = typed_frame(columns, config)
             logger.info(f"Created DataFrame with columns: {df.columns.tolist()}")
         except Exception as e:
             logger.error(f"Error creating DataFrame: {str(e)}")
             raise
 
-        # Clean column names
-        df.columns = [str(col).strip() for col in df.columns]
-        logger.info("Cleaned column names")
-
-        # Handle missing values
-        df = df.fillna(0)
-        logger.info("Handled missing values")
-
         return df
 
     except Exception as e:
@@ -0,0 +1,148 @@
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.metric_formulas import looks_like_ratio, metric_key, parse_formula
+
+logger = logging.getLogger(__name__)
+
+# Always derived unless metric_config redefines them. `fill_missing` is the value an
+# input reads as when the data does not have it (Cost is 0 without requests sent).
+DEFAULT_DERIVED_METRICS = {
+    "Cost": {
+        "formula": "Total Requests Sent (HB Provider Response) x 0.025 / 1M",
+        "fill_missing": 0,
+    },
+    "Net Profit": {
+        "formula": "Profit (HB Rendered Ad) - Cost",
+        "fill_missing": 0,
+    },
+}
+
+
+class Step:
+    """One derived metric: its compiled formula and the frame columns and derived metrics it reads."""
+
+    def __init__(self, name: str, fn: Callable, columns: List[str], derived: List[str], fill_missing: Optional[float]):
+        self.name = name
+        self.fn = fn
+        self.columns = columns
+        self.derived = derived
+        self.fill_missing = fill_missing
+
+
+def derived_specs(metric_config: dict) -> Dict[str, dict]:
+    """Every metric_config entry with a formula, on top of (and overriding fields of) the defaults."""
+    specs = dict(DEFAULT_DERIVED_METRICS)
+    for name, spec in (metric_config or {}).items():
+        if isinstance(spec, dict) and isinstance(spec.get("formula"), str) and spec["formula"].strip():
+            specs[name] = {**DEFAULT_DERIVED_METRICS.get(name, {}), **spec}
+    return specs
+
+
+def plan_derived_metrics(specs: Dict[str, dict], columns: Sequence[str]) -> List[Step]:
+    """
+    Parses the formulas of the metrics missing from `columns` into a dependency DAG and
+    returns them in topological order. Metrics the data already has (e.g. Konom's own
+    Bidder Win Rate) are left alone. A metric whose inputs are unavailable is skipped
+    unless it sets fill_missing, as is every metric on a dependency cycle.
+    """
+    present = {metric_key(c) for c in columns}
+    targets = {name: spec for name, spec in specs.items() if metric_key(name) not in present}
+    names = list(columns) + list(targets)
+
+    formulas = {}
+    for name, spec in targets.items():
+        formula = parse_formula(spec["formula"], names)
+        if formula is None:
+            logger.warning(f"Ignoring malformed formula for {name}: {spec['formula']!r}")
+        elif looks_like_ratio(name) and not formula.has_division:
+            logger.warning(f"Ignoring formula for {name}: a rate needs a denominator, got {spec['formula']!r}")
+        else:
+            formulas[name] = formula
+
+    # Depth-first, so each metric directly follows its dependencies in config order
+    deps = {name: [i for i in f.inputs if i in formulas] for name, f in formulas.items()}
+    order: List[str] = []
+    cyclic: List[str] = []
+
+    def visit(name: str, path: List[str]):
+        if name in order or name in cyclic:
+            return
+        if name in path:
+            cyclic.extend(n for n in path[path.index(name):] if n not in cyclic)
+            return
+        for dep in deps[name]:
+            visit(dep, path + [name])
+        if name not in cyclic and not any(d in cyclic for d in deps[name]):
+            order.append(name)
+
+    for name in formulas:
+        visit(name, [])
+    if cyclic:
+        logger.warning(f"Skipping derived metrics on a dependency cycle: {cyclic}")
+
+    steps: List[Step] = []
+    computed = set()
+    for name in order:
+        formula, fill = formulas[name], targets[name].get("fill_missing")
+        unavailable = [i for i in formula.inputs if i in targets and i not in computed] + formula.missing
+        if unavailable and fill is None:
+            logger.debug(f"Not deriving {name}: no data for {unavailable}")
+            continue
+        # Names that are not derived are read from the frame (or filled when it lacks them)
+        frame_inputs = [i for i in formula.inputs if i not in targets]
+        derived_inputs = [i for i in formula.inputs if i in targets]
+        steps.append(Step(name, formula.compile(), frame_inputs, derived_inputs, fill))
+        computed.add(name)
+    return steps
+
+
+@lru_cache(maxsize=64)
+def _cached_plan(specs_json: str, columns: Tuple[str, ...]) -> List[Step]:
+    return plan_derived_metrics(json.loads(specs_json), columns)
+
+
+def _float_column(df: pd.DataFrame, col: str) -> Optional[np.ndarray]:
+    try:
+        return df[col].to_numpy(dtype=np.float64)
+    except (ValueError, TypeError):
+        return None
+
+
+def derive_metrics(df: pd.DataFrame, metric_config: dict) -> Dict[str, np.ndarray]:
+    """
+    Evaluates the derived metrics for a frame: one vectorised expression per metric, in
+    dependency order. The plan is cached per config and column set. Results where a
+    denominator is zero are 0, like the parser's missing values.
+    """
+    # Not sorted: config order decides the order of independent derived columns
+    specs_json = json.dumps(derived_specs(metric_config), default=str)
+    steps = _cached_plan(specs_json, tuple(df.columns))
+
+    columns: Dict[str, Optional[np.ndarray]] = {}
+    derived: Dict[str, np.ndarray] = {}
+    for step in steps:
+        inputs: Dict[str, Any] = {}
+        for name in step.columns:
+            if name not in columns:
+                columns[name] = _float_column(df, name) if name in df.columns else None
+            inputs[name] = columns[name]
+        for name in step.derived:
+            inputs[name] = derived.get(name)
+
+        unavailable = [name for name, value in inputs.items() if value is None]
+        if unavailable and step.fill_missing is None:
+            logger.warning(f"Not deriving {step.name}: no numeric data for {unavailable}")
+            continue
+        for name in unavailable:
+            inputs[name] = float(step.fill_missing)
+
+        result = np.broadcast_to(step.fn(inputs), (len(df),)).astype(np.float64)
+        result[~np.isfinite(result)] = 0
+        derived[step.name] = result
+    return derived
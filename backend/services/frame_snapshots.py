@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+import pandas as pd
+from config.config_manager import ConfigSnapshot
+from utils.disk_cache import CACHE_DIR
+from services.konom_query import KONOM_CACHE_ENABLED, cache_ttl_for, canonical_request_key
+
+logger = logging.getLogger(__name__)
+
+FRAME_SNAPSHOTS_ENABLED = os.getenv("FRAME_SNAPSHOTS_ENABLED", "1" if KONOM_CACHE_ENABLED else "0") == "1"
+FRAME_SNAPSHOT_MAX_MB = int(os.getenv("FRAME_SNAPSHOT_MAX_MB", "1024"))
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "frames")
+
+# Schema metadata key for the expiry; an open time window's data may still change
+EXPIRES_AT = b"expires_at"
+
+
+def _pyarrow():
+    """pyarrow, imported on first use (it is slow to import); None when it is not installed."""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError as e:
+        logger.info(f"pyarrow unavailable ({e}), frame snapshots are off")
+        return None
+    return pa
+
+
+def config_fingerprint(config: ConfigSnapshot) -> str:
+    """Hash of the config that parsing and preprocessing read, stable across restarts unlike the version."""
+    parts = {}
+    for name in ("metric_config", "deep_dive_config"):
+        try:
+            parts[name] = config.get(name)
+        except Exception as e:
+            parts[name] = repr(e)
+    encoded = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def snapshot_key(request_json: dict, config: ConfigSnapshot) -> str:
+    payload = f"{canonical_request_key(request_json)}:{config_fingerprint(config)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FrameSnapshots:
+    """
+    Prepared DataFrames as uncompressed Arrow IPC files under CACHE_DIR/frames, keyed
+    by the Konom request hash and the config fingerprint. Reads memory-map the file, so
+    numeric columns are views of the page cache rather than copies in the Python heap,
+    and a repeat of a query skips the network, the JSON flattening and preprocessing.
+    Snapshots of open time windows expire like the Konom cache; file mtime is the LRU
+    clock for evicting down to max_bytes.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, max_bytes: int = FRAME_SNAPSHOT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, request_json: dict, config: ConfigSnapshot) -> Optional[pd.DataFrame]:
+        pa = _pyarrow()
+        if pa is None:
+            return None
+        path = self._path(snapshot_key(request_json, config))
+        try:
+            reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+            metadata = reader.schema.metadata or {}
+            expires_at = metadata.get(EXPIRES_AT)
+            if expires_at is not None and float(expires_at) <= time.time():
+                self._remove(path)
+                self._count("expired")
+                self._count("misses")
+                return None
+            # split_blocks keeps one array per column, so no consolidation copies the mapped buffers
+            df = reader.read_all().to_pandas(split_blocks=True)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError, pa.ArrowException) as e:
+            logger.warning(f"Dropping unreadable frame snapshot {path}: {e}")
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self._count("hits")
+        return df
+
+    def put(self, request_json: dict, config: ConfigSnapshot, df: pd.DataFrame):
+        pa = _pyarrow()
+        if pa is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        ttl = cache_ttl_for(request_json)
+        path = self._path(snapshot_key(request_json, config))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if ttl is not None:
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), EXPIRES_AT: str(time.time() + ttl)})
+            with pa.OSFile(tmp_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+            # e.g. Windows refuses to replace a file another request still has mapped
+            logger.warning(f"Could not write frame snapshot {path}: {e}")
+            self._remove(tmp_path)
+            return
+        self._count("writes")
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(".arrow"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+frame_snapshots = FrameSnapshots()
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from utils.disk_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """One submitted analysis. `run` receives the job so it can report progress."""
+
+    def __init__(self, kind: str, key: str, run: Optional[Callable[["Job"], Awaitable[Any]]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.run = run
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def set_progress(self, done: Optional[int] = None, total: Optional[int] = None):
+        if done is not None:
+            self.done = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        job = cls(data["kind"], key="")
+        job.id = data["job_id"]
+        job.status = data["status"]
+        job.done = data["progress"]["done"]
+        job.total = data["progress"]["total"]
+        job.result = data.get("result")
+        job.error = data.get("error")
+        job.created_at = data["created_at"]
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        return job
+
+
+class JobQueue:
+    """
+    In-process job runner: a bounded pool of asyncio workers drains a FIFO queue.
+    Submitting a job identical (same key) to one still queued or running returns that
+    job instead of starting another. Finished jobs are written to JOBS_DIR as JSON so
+    status and results survive a restart; jobs that were in flight at shutdown are lost.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, directory: str = JOBS_DIR):
+        self.workers = max(1, workers)
+        self.directory = directory
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self._stopping = False
+
+    def _start(self):
+        # The queue belongs to the running loop, so workers start with the first job
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._stopping = False
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self.prune()
+
+    def submit(self, kind: str, key: str, run: Callable[[Job], Awaitable[Any]]):
+        """Returns (job, deduplicated)."""
+        self._start()
+        existing = self._in_flight.get(key)
+        if existing is not None:
+            logger.info(f"Job {existing.id} already covers this {kind} request")
+            return existing, True
+        job = Job(kind, key, run)
+        self._jobs[job.id] = job
+        self._in_flight[key] = job
+        self._queue.put_nowait(job)
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        if job.task is not None:
+            job.task.cancel()  # the worker records the cancellation
+        else:
+            self._finish(job, CANCELLED)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue  # cancelled while waiting
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.task = asyncio.create_task(job.run(job))
+                try:
+                    result = await job.task
+                    job.result = jsonable_encoder(result)
+                    self._finish(job, DONE)
+                except asyncio.CancelledError:
+                    # Cancelling the worker cancels the job it awaits too, so job.task.cancelled()
+                    # alone cannot tell a shutdown from a cancel request
+                    if self._stopping or not job.task.cancelled():
+                        raise
+                    self._finish(job, CANCELLED)
+                except Exception as e:
+                    job.error = getattr(e, "detail", None) or str(e)
+                    logger.warning(f"Job {job.id} ({job.kind}) failed: {job.error}")
+                    self._finish(job, FAILED)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        job.task = None
+        job.run = None
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+        # Finished results are served from disk from now on, unless they could not be written
+        if self._save(job):
+            self._jobs.pop(job.id, None)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: Job) -> bool:
+        path = self._path(job.id)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(job.to_dict(include_result=True), f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not persist job {job.id}: {e}")
+            return False
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r") as f:
+                job = Job.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Unreadable job file for {job_id}: {e}")
+            return None
+        return job
+
+    def prune(self):
+        """Deletes persisted jobs older than JOB_RETENTION_DAYS."""
+        cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    async def shutdown(self):
+        """Stops the workers; a running job is cancelled with its worker and not persisted."""
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+
+job_queue = JobQueue()
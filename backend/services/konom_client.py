@@ -0,0 +1,328 @@
+import os
+import asyncio
+import random
+import socket
+import threading
+import time
+import logging
+from typing import Dict, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from fastapi import HTTPException
+from utils import debug_capture
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_API_BASE = "http://nv-konom.internal.reports.mn/api/v2/query/"
+
+KONOM_CONNECT_TIMEOUT = float(os.getenv("KONOM_CONNECT_TIMEOUT", "5"))
+KONOM_READ_TIMEOUT = float(os.getenv("KONOM_READ_TIMEOUT", "180"))
+KONOM_MAX_RETRIES = int(os.getenv("KONOM_MAX_RETRIES", "3"))
+KONOM_POOL_SIZE = int(os.getenv("KONOM_POOL_SIZE", "10"))
+
+# Konom queries are read-only, so a POST can be replayed safely on these
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+# Connection setup timings for the request in flight on this thread
+_conn_timing = threading.local()
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After when it sends one."""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def build_headers() -> Dict[str, str]:
+    headers = {
+        "X-KONOM-USER": os.getenv("QUERY_API_USER"),
+        "X-AUTH-TOKEN": os.getenv("QUERY_API_TOKEN"),
+        "X-KONOM-GROUP": os.getenv("QUERY_API_GROUP"),
+        "Content-Type": os.getenv("QUERY_CONTENT_TYPE"),
+    }
+    return {k: v for k, v in headers.items() if v is not None}
+
+
+class _TimedConnectionMixin:
+    """
+    Records DNS and connect time whenever urllib3 opens a new socket (pooled reuse skips
+    this). The host is resolved once here and urllib3 connects to the resolved address,
+    so the lookup is not repeated and connect time covers only TCP (and TLS) setup.
+
+    This leans on urllib3 2.x internals: HTTPConnection._new_conn() opens the socket to
+    self._dns_host, and PoolManager.pool_classes_by_scheme picks the pool classes.
+    requirements.txt pins urllib3 to 2.x; recheck both on a major upgrade.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        _conn_timing.dns_ms = 0.0
+        super().connect()
+        _conn_timing.connect_ms = (time.perf_counter() - start) * 1000 - _conn_timing.dns_ms
+
+    def _new_conn(self):
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        finally:
+            _conn_timing.dns_ms = (time.perf_counter() - start) * 1000
+
+        # Try each address in turn, as urllib3 does; connecting to a numeric address skips DNS
+        error = NewConnectionError(self, f"Failed to establish a new connection: no addresses for {host}")
+        try:
+            for *_, sockaddr in addresses:
+                self._dns_host = sockaddr[0]
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:  # NewConnectionError included
+                    error = e
+        finally:
+            self._dns_host = host
+        raise error
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class KonomClient:
+    """
+    Long-lived Konom query client. Keeps a pooled keep-alive session with the auth
+    headers built once, applies connect/read timeouts, retries connection errors and
+    retryable statuses with jittered backoff, and records per-call timings.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        connect_timeout: float = KONOM_CONNECT_TIMEOUT,
+        read_timeout: float = KONOM_READ_TIMEOUT,
+        max_retries: int = KONOM_MAX_RETRIES,
+        pool_size: int = KONOM_POOL_SIZE,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+    ):
+        self.base_url = base_url or os.getenv("QUERY_API_BASE", DEFAULT_QUERY_API_BASE)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.last_timing: Dict[str, float] = {}
+
+        self.session = requests.Session()
+        adapter = _TimedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(build_headers())
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+
+    def _send(self, request_json: dict):
+        _conn_timing.dns_ms = 0.0
+        _conn_timing.connect_ms = 0.0
+        start = time.perf_counter()
+        resp = self.session.post(self.base_url, json=request_json, timeout=self.timeout, stream=True)
+        headers_at = time.perf_counter()
+        body = resp.content
+        done = time.perf_counter()
+        if debug_capture.ENABLED:
+            debug_capture.capture("konom_response", body)
+        setup_ms = _conn_timing.dns_ms + _conn_timing.connect_ms
+        timing = {
+            "dns_ms": round(_conn_timing.dns_ms, 1),
+            "connect_ms": round(_conn_timing.connect_ms, 1),
+            "ttfb_ms": round(max(0.0, (headers_at - start) * 1000 - setup_ms), 1),
+            "body_ms": round((done - headers_at) * 1000, 1),
+            "total_ms": round((done - start) * 1000, 1),
+            "bytes": len(body),
+        }
+        return resp, timing
+
+    def post_query(self, request_json: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                resp, timing = self._send(request_json)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Konom request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            timing["attempts"] = attempt + 1
+            self.last_timing = timing
+            logger.info(f"Konom API status code: {resp.status_code}, timing: {timing}")
+            if resp.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                delay = self._backoff(attempt, resp.headers.get("Retry-After"))
+                logger.warning(f"Konom returned {resp.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            if resp.status_code == 200:
+                return resp.json()
+            raise HTTPException(status_code=resp.status_code, detail=f"Konom API error: {resp.text}")
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncKonomClient:
+    """
+    asyncio counterpart of KonomClient on a pooled httpx.AsyncClient, with the same
+    timeouts and retry policy. Timings come from httpcore trace events; DNS resolution
+    happens inside the TCP connect there, so it is reported as part of connect_ms.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        connect_timeout: float = KONOM_CONNECT_TIMEOUT,
+        read_timeout: float = KONOM_READ_TIMEOUT,
+        max_retries: int = KONOM_MAX_RETRIES,
+        pool_size: int = KONOM_POOL_SIZE,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+    ):
+        self.base_url = base_url or os.getenv("QUERY_API_BASE", DEFAULT_QUERY_API_BASE)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.last_timing: Dict[str, float] = {}
+        self.client = httpx.AsyncClient(
+            headers=build_headers(),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _send(self, request_json: dict):
+        marks: Dict[str, float] = {}
+
+        async def trace(event: str, info: dict):
+            marks[event] = time.perf_counter()
+
+        start = time.perf_counter()
+        resp = await self.client.post(self.base_url, json=request_json, extensions={"trace": trace})
+        done = time.perf_counter()
+        if debug_capture.ENABLED:
+            debug_capture.capture("konom_response", resp.content)
+
+        def span(begin: str, end: str) -> float:
+            if begin in marks and end in marks:
+                return round((marks[end] - marks[begin]) * 1000, 1)
+            return 0.0
+
+        headers_at = marks.get("http11.receive_response_headers.complete", done)
+        sent_at = marks.get("http11.send_request_headers.started", start)
+        timing = {
+            "connect_ms": span("connection.connect_tcp.started", "connection.connect_tcp.complete"),
+            "tls_ms": span("connection.start_tls.started", "connection.start_tls.complete"),
+            "ttfb_ms": round((headers_at - sent_at) * 1000, 1),
+            "body_ms": round((done - headers_at) * 1000, 1),
+            "total_ms": round((done - start) * 1000, 1),
+            "bytes": len(resp.content),
+        }
+        return resp, timing
+
+    async def post_query(self, request_json: dict) -> dict:
+        attempt = 0
+        while True:
+            try:
+                resp, timing = await self._send(request_json)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(f"Konom request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            timing["attempts"] = attempt + 1
+            self.last_timing = timing
+            logger.info(f"Konom API status code: {resp.status_code}, timing: {timing}")
+            if resp.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, resp.headers.get("Retry-After"))
+                logger.warning(f"Konom returned {resp.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if resp.status_code == 200:
+                return resp.json()
+            raise HTTPException(status_code=resp.status_code, detail=f"Konom API error: {resp.text}")
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client: Optional[KonomClient] = None
+_client_lock = threading.Lock()
+
+
+def get_konom_client() -> KonomClient:
+    """Shared client, created on first use so that .env has been loaded by then."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KonomClient()
+    return _client
+
+
+_async_client: Optional[AsyncKonomClient] = None
+
+
+def get_async_konom_client() -> AsyncKonomClient:
+    """Shared async client; only ever touched from the server's event loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncKonomClient()
+    return _async_client
+
+
+async def close_konom_clients():
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,191 @@
+import copy
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.metric_formulas import find_formula, looks_like_ratio, metric_key, parse_formula, Formula
+
+SUM = "sum"
+RECOMPUTE = "recompute"
+WEIGHTED = "weighted"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class NotMergeable(ValueError):
+    """Raised when per-window responses cannot be combined into the full-window answer."""
+
+
+def parse_time(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def split_windows(start: datetime, end: datetime, hours: float) -> List[Tuple[datetime, datetime]]:
+    """
+    Cuts [start, end) at multiples of `hours` since the epoch, so the same day is the same
+    sub-window whichever range it was requested as part of.
+    """
+    step = timedelta(hours=hours)
+    windows = []
+    cursor = start
+    while cursor < end:
+        boundary = _EPOCH + step * (math.floor((cursor - _EPOCH) / step) + 1)
+        windows.append((cursor, min(boundary, end)))
+        cursor = windows[-1][1]
+    return windows
+
+
+def split_request(request_json: dict, hours: float, max_parts: int) -> Optional[List[dict]]:
+    """
+    One request per sub-window of the single 'times' window, or None when the request
+    does not have exactly one well-formed window or would not split into 2..max_parts parts.
+    """
+    windows = request_json.get("times") or []
+    if len(windows) != 1 or not isinstance(windows[0], dict):
+        return None
+    start, end = parse_time(windows[0].get("startTime")), parse_time(windows[0].get("endTime"))
+    if start is None or end is None or end <= start:
+        return None
+    parts = split_windows(start, end, hours)
+    if not 1 < len(parts) <= max_parts:
+        return None
+
+    requests = []
+    for part_start, part_end in parts:
+        part = copy.deepcopy(request_json)
+        part["times"] = [{
+            "startTime": part_start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "endTime": part_end.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        }]
+        # The top-level copies use the UI's "YYYY-MM-DD HH:MM:SS" form
+        if "startTime" in part:
+            part["startTime"] = part_start.strftime("%Y-%m-%d %H:%M:%S")
+        if "endTime" in part:
+            part["endTime"] = part_end.strftime("%Y-%m-%d %H:%M:%S")
+        requests.append(part)
+    return requests
+
+
+class MergePlan:
+    """
+    How each measure of a request combines across sub-windows: additive measures are
+    summed; ratios are recomputed from their metric_config formula when all of its inputs
+    are summed measures of the same request, or else averaged weighted by the formula's
+    denominator (exact when the missing numerator inputs are additive counts).
+    """
+
+    def __init__(self, rules: Dict[str, Tuple[str, Optional[Formula]]]):
+        self.rules = rules
+        self._keys = {metric_key(name): name for name in rules}
+
+    def measure(self, key: str) -> Optional[str]:
+        return self._keys.get(metric_key(key))
+
+    @classmethod
+    def for_request(cls, request_json: dict, metric_config: dict) -> Optional["MergePlan"]:
+        """None when some measure cannot be merged (e.g. a custom percentage with no formula)."""
+        measures = [m for m in request_json.get("measures") or [] if isinstance(m, str)]
+        if not measures:
+            return None
+        custom = {metric_key(c.get("outputName", "")) for c in request_json.get("customMeasures") or []
+                  if isinstance(c, dict)}
+        ratios = [m for m in measures if metric_key(m) in custom or looks_like_ratio(m)]
+        additive = [m for m in measures if m not in ratios]
+
+        rules: Dict[str, Tuple[str, Optional[Formula]]] = {m: (SUM, None) for m in additive}
+        for name in ratios:
+            formula = parse_formula(find_formula(metric_config, name), additive)
+            split = formula.ratio() if formula is not None else None
+            # A "rate" without a denominator cannot reproduce Konom's own value
+            if split is None:
+                return None
+            denominator = split[1]
+            if not formula.missing:
+                rules[name] = (RECOMPUTE, formula)
+            elif denominator.inputs and not denominator.missing:
+                rules[name] = (WEIGHTED, denominator)
+            else:
+                return None
+        return cls(rules)
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise NotMergeable(f"non-numeric measure value {value!r}")
+    return None if math.isnan(value) else float(value)
+
+
+def _split_fields(node: dict, plan: MergePlan) -> Tuple[tuple, Dict[str, Optional[float]]]:
+    """(identity, measure values) of a node; identity is its dimension values."""
+    identity = []
+    values = {}
+    for key, value in node.items():
+        if key == "split":
+            continue
+        name = plan.measure(key)
+        if name is not None:
+            values[key] = _number(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            raise NotMergeable(f"unexpected numeric field {key!r}")
+        elif not isinstance(value, (dict, list)):
+            identity.append((key, value))
+    return tuple(identity), values
+
+
+def _merge_nodes(nodes: List[dict], plan: MergePlan) -> dict:
+    fields = [_split_fields(node, plan) for node in nodes]
+    merged: Dict[str, Any] = {}
+    for key, value in nodes[0].items():
+        if key != "split":
+            merged[key] = value
+
+    keys = list(dict.fromkeys(k for _, values in fields for k in values))
+    totals: Dict[str, Optional[float]] = {}
+    for key in keys:
+        name = plan.measure(key)
+        if plan.rules[name][0] == SUM:
+            present = [values.get(key) for _, values in fields if values.get(key) is not None]
+            totals[name] = sum(present) if present else None
+            merged[key] = totals[name]
+
+    for key in keys:
+        name = plan.measure(key)
+        rule, formula = plan.rules[name]
+        if rule == RECOMPUTE:
+            merged[key] = formula.evaluate(totals)
+        elif rule == WEIGHTED:
+            weighted, weight = 0.0, 0.0
+            for _, values in fields:
+                part_totals = {plan.measure(k): v for k, v in values.items()}
+                denominator, value = formula.evaluate(part_totals), values.get(key)
+                if denominator and value is not None:
+                    weighted += value * denominator
+                    weight += denominator
+            merged[key] = weighted / weight if weight else None
+
+    if any("split" in node for node in nodes):
+        groups: Dict[tuple, List[dict]] = {}
+        for node in nodes:
+            for child in node.get("split") or []:
+                identity, _ = _split_fields(child, plan)
+                groups.setdefault(identity, []).append(child)
+        merged["split"] = [_merge_nodes(children, plan) for children in groups.values()]
+    return merged
+
+
+def merge_responses(responses: List[dict], plan: MergePlan) -> dict:
+    """Combines per-window Konom responses into one, matching split-tree nodes by their dimension values."""
+    results = [r.get("result") for r in responses]
+    if not all(isinstance(r, dict) for r in results):
+        raise NotMergeable("response without a 'result' tree")
+    merged = {k: v for k, v in responses[0].items() if k != "result"}
+    merged["result"] = _merge_nodes(results, plan)
+    return merged
@@ -1,35 +1,196 @@
 import os
-import requests
 import json
 import copy
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
 from fastapi import HTTPException
 import logging
+from utils.disk_cache import DiskCache
+from utils.single_flight import SingleFlight
+from utils import debug_capture
+from config.config_manager import load_metric_config
+from services.konom_client import KONOM_POOL_SIZE, get_konom_client, get_async_konom_client
+from services.konom_incremental import MergePlan, NotMergeable, merge_responses, parse_time, split_request
 
 logger = logging.getLogger(__name__)
 
-QUERY_API_BASE = os.getenv("QUERY_API_BASE", "http://nv-konom.internal.reports.mn/api/v2/query/")
+KONOM_CACHE_ENABLED = os.getenv("KONOM_CACHE_ENABLED", "1") == "1"
+KONOM_CACHE_MAX_MB = int(os.getenv("KONOM_CACHE_MAX_MB", "512"))
+# Windows that are still open can gain data, so they only live briefly in the cache
+KONOM_CACHE_OPEN_WINDOW_TTL = float(os.getenv("KONOM_CACHE_OPEN_WINDOW_TTL", "900"))
+# Fetch long windows as per-day (by default) sub-queries so re-runs over an extended
+# window only fetch the new days. Off by default: Konom applies row thresholds (top N)
+# per query, so merged days can keep rows a whole-window query would have cut.
+KONOM_INCREMENTAL = os.getenv("KONOM_INCREMENTAL", "0") == "1"
+KONOM_INCREMENTAL_GRANULARITY_HOURS = float(os.getenv("KONOM_INCREMENTAL_GRANULARITY_HOURS", "24"))
+KONOM_INCREMENTAL_MAX_PARTS = int(os.getenv("KONOM_INCREMENTAL_MAX_PARTS", "62"))
 
-def fetch_data(request_json: dict) -> dict:
-    headers = {
-        "X-KONOM-USER": os.getenv("QUERY_API_USER"),
-        "X-AUTH-TOKEN": os.getenv("QUERY_API_TOKEN"),
-        "X-KONOM-GROUP": os.getenv("QUERY_API_GROUP"),
-        "Content-Type": os.getenv("QUERY_CONTENT_TYPE"),
-    }
+konom_cache = DiskCache("konom", max_bytes=KONOM_CACHE_MAX_MB * 1024 * 1024)
+konom_flight = SingleFlight()
+
+# Request fields that never change what Konom returns
+IGNORED_KEYS = ("group_by", "queryId")
+
+
+def _normalise_thresholds(value: Any) -> Any:
+    if isinstance(value, dict):
+        normalised = {}
+        for k, v in value.items():
+            if k == "threshold" and isinstance(v, (int, float, str)) and not isinstance(v, bool):
+                text = str(v).strip()
+                try:
+                    number = float(text)
+                    text = str(int(number)) if number.is_integer() else str(number)
+                except ValueError:
+                    pass
+                normalised[k] = text
+            else:
+                normalised[k] = _normalise_thresholds(v)
+        return normalised
+    if isinstance(value, list):
+        return [_normalise_thresholds(v) for v in value]
+    return value
+
+
+def canonical_request_key(request_json: dict) -> str:
+    """
+    Stable hash of a Konom request. Keys are sorted so field order does not matter,
+    thresholds are compared as strings (5 == "5"), and 'group_by' (only used by our own
+    routes) and 'queryId' (a per-run id from the UI) are dropped since neither changes the data.
+    """
+    payload = _normalise_thresholds({k: v for k, v in request_json.items() if k not in IGNORED_KEYS})
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def cache_ttl_for(request_json: dict) -> Optional[float]:
+    """None (keep forever) when every 'times' window has already closed, otherwise the open-window TTL."""
+    windows = request_json.get("times") or []
+    end_times = [parse_time(w.get("endTime")) for w in windows if isinstance(w, dict)]
+    if not end_times or any(t is None for t in end_times):
+        return KONOM_CACHE_OPEN_WINDOW_TTL
+    now = datetime.now(timezone.utc)
+    if all(t <= now for t in end_times):
+        return None
+    return KONOM_CACHE_OPEN_WINDOW_TTL
+
+
+def _flight_key(request_json: dict, use_cache: bool) -> str:
+    key = canonical_request_key(request_json)
+    return key if use_cache else f"{key}:uncached"
+
+
+def incremental_plan(request_json: dict, use_cache: bool) -> Optional[Tuple[List[dict], MergePlan]]:
+    """Sub-window requests and how to merge them, or None to fetch the request as a whole."""
+    if not (KONOM_INCREMENTAL and use_cache):
+        return None
+    parts = split_request(request_json, KONOM_INCREMENTAL_GRANULARITY_HOURS, KONOM_INCREMENTAL_MAX_PARTS)
+    if parts is None:
+        return None
+    plan = MergePlan.for_request(request_json, load_metric_config())
+    if plan is None:
+        logger.info("Konom request has measures that cannot be merged across days; fetching the whole window")
+        return None
+    return parts, plan
+
+
+def fetch_data(request_json: dict, use_cache: bool = KONOM_CACHE_ENABLED) -> dict:
+    """
+    Konom response for a request, from the cache when possible. Identical requests made
+    while one is already in flight wait for it and share its (read-only) result.
+    With KONOM_INCREMENTAL, long windows are fetched and cached day by day and merged.
+    """
+    incremental = incremental_plan(request_json, use_cache)
+    if incremental is not None:
+        parts, plan = incremental
+        responses = [_fetch_whole(part, use_cache) for part in parts]
+        merged = _merge_or_none(responses, plan)
+        if merged is not None:
+            return merged
+    return _fetch_whole(request_json, use_cache)
+
+
+def _merge_or_none(responses: List[dict], plan: MergePlan) -> Optional[dict]:
     try:
-        resp = requests.post(QUERY_API_BASE, json=request_json, headers=headers)
-        logger.info(f"Konom API status code: {resp.status_code}")
-        logger.info(f"Konom API response: {resp.text[:500]}")
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            raise HTTPException(status_code=resp.status_code, detail=f"Konom API error: {resp.text}")
+        merged = merge_responses(responses, plan)
+    except NotMergeable as e:
+        logger.warning(f"Could not merge per-day Konom responses ({e}); fetching the whole window")
+        return None
+    logger.info(f"Merged {len(responses)} per-window Konom responses")
+    return merged
+
+
+def _fetch_whole(request_json: dict, use_cache: bool) -> dict:
+    return konom_flight.do(_flight_key(request_json, use_cache), lambda: _fetch_data(request_json, use_cache))
+
+
+def _fetch_data(request_json: dict, use_cache: bool) -> dict:
+    cache_key = canonical_request_key(request_json) if use_cache else None
+    if cache_key:
+        cached = konom_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Konom cache hit for request {cache_key[:12]}")
+            return cached
+
+    response_json = _post_query(request_json)
+    if cache_key:
+        konom_cache.put(cache_key, response_json, ttl=cache_ttl_for(request_json))
+    return response_json
+
+
+def _post_query(request_json: dict) -> dict:
+    try:
+        return get_konom_client().post_query(request_json)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Konom API request failed: {e}")
 
 
-def fetch_deep_dive_data(original_request_json: dict, dimensions: list, threshold: int = 10) -> dict:
+async def fetch_data_async(request_json: dict, use_cache: bool = KONOM_CACHE_ENABLED) -> dict:
+    """Same as fetch_data, but awaits the async client; cache file I/O runs in a worker thread."""
+    incremental = incremental_plan(request_json, use_cache)
+    if incremental is not None:
+        parts, plan = incremental
+        # Missing days are fetched concurrently, at most one pool's worth at a time
+        limit = asyncio.Semaphore(KONOM_POOL_SIZE)
+
+        async def fetch_part(part):
+            async with limit:
+                return await _fetch_whole_async(part, use_cache)
+
+        responses = await asyncio.gather(*(fetch_part(part) for part in parts))
+        merged = await asyncio.to_thread(_merge_or_none, responses, plan)
+        if merged is not None:
+            return merged
+    return await _fetch_whole_async(request_json, use_cache)
+
+
+async def _fetch_whole_async(request_json: dict, use_cache: bool) -> dict:
+    return await konom_flight.ado(_flight_key(request_json, use_cache), lambda: _fetch_data_async(request_json, use_cache))
+
+
+async def _fetch_data_async(request_json: dict, use_cache: bool) -> dict:
+    cache_key = canonical_request_key(request_json) if use_cache else None
+    if cache_key:
+        cached = await asyncio.to_thread(konom_cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Konom cache hit for request {cache_key[:12]}")
+            return cached
+
+    try:
+        response_json = await get_async_konom_client().post_query(request_json)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Konom API request failed: {e}")
+    if cache_key:
+        await asyncio.to_thread(konom_cache.put, cache_key, response_json, cache_ttl_for(request_json))
+    return response_json
+
+
+def build_deep_dive_request(original_request_json: dict, dimensions: list, threshold: int = 10) -> dict:
+    """Adds the deep-dive dimensions to 'rows' (ahead of Experiment Tokens) and 'dimensionObjectList'."""
     request_json = copy.deepcopy(original_request_json)
+    request_json.pop("group_by", None)
     rows = request_json.get("rows", [])
     dim_objects = request_json.get("dimensionObjectList", [])
 
@@ -50,10 +211,14 @@ def fetch_deep_dive_data(original_request_json: dict, dimensions: list, threshol
 
     request_json["rows"] = rows
     request_json["dimensionObjectList"] = dim_objects
+    return request_json
+
+
+def fetch_deep_dive_data(original_request_json: dict, dimensions: list, threshold: int = 10) -> dict:
+    request_json = build_deep_dive_request(original_request_json, dimensions, threshold)
 
-    # Optionally log the request JSON for debugging
-    with open("deep_dive_request_debug.json", "w") as f:
-        json.dump(request_json, f, indent=2)
+    if debug_capture.ENABLED:
+        debug_capture.capture("deep_dive_request", json.dumps(request_json, indent=2), force=True)
 
     response = fetch_data(request_json)
     return response
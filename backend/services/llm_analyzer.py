@@ -2,15 +2,24 @@
 
 import pandas as pd
 import json
-import os
-import openai
+import asyncio
+import logging
+from typing import Any, Optional
 from fastapi import HTTPException
-from utils.llm_utils import safe_parse_llm_json
+from config.config_manager import ConfigSnapshot, current_config
+from utils.llm_utils import LLM_CACHE_ENABLED, safe_parse_llm_json, complete_prompt
 from models.analysis_schema import OverallAnalysisResponse
 from services.utils import enhance_with_percentage_changes
+from services.prompt_builder import PromptReport, fit_table, select_columns
 
+logger = logging.getLogger(__name__)
 
-def run_overall_analysis_agent(df: pd.DataFrame, system: str) -> dict:
+
+def build_overall_prompt(
+    df: pd.DataFrame, system: str, config: Optional[ConfigSnapshot] = None, report: Optional[PromptReport] = None,
+) -> str:
+    # Cohort / label columns are kept alongside the configured metrics
+    id_columns = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
     # Enhance with % change columns if possible
     if 'Experiment Tokens' in df.columns:
         df = enhance_with_percentage_changes(df)
@@ -18,17 +27,35 @@ def run_overall_analysis_agent(df: pd.DataFrame, system: str) -> dict:
         for col in df.columns:
             if col.startswith('% Change in '):
                 df[col] = df[col].apply(lambda x: f"{x}" if not x else (x if x.endswith('%') else f"{float(x.replace('%','')):.2f}%" if isinstance(x, str) and x.replace('%','').replace('.','',1).replace('+','',1).replace('-','',1).isdigit() else x))
-    # Convert DataFrame to JSON records
+    # float32 measures are widened so their rounded values print as such
+    narrow = df.select_dtypes("float32").columns
+    if len(narrow):
+        df = df.astype(dict.fromkeys(narrow, "float64")).round(dict.fromkeys(narrow, 2))
+    # Convert DataFrame to a compact CSV table of the configured metrics
     metrics_json = df.to_dict(orient='records')
-    metrics_text = json.dumps(metrics_json, indent=2)
+    columns = select_columns(list(df.columns), (config or current_config()).metric_config, keep=id_columns)
+    metrics_text, rows_dropped = fit_table(metrics_json, columns)
+
+    prompt = overall_analysis_prompt(system, f"Metrics (CSV):\n{metrics_text}")
+    if report is not None:
+        report.record(
+            lambda: overall_analysis_prompt(system, f"Metrics:\n{json.dumps(metrics_json, indent=2)}"),
+            prompt, rows_dropped, len(df.columns) - len(columns),
+        )
+    return prompt
+
 
-    # Build the prompt
+def log_prompt_report(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is None:
+        logger.info(f"Overall analysis prompt tokens: {task.result()}")
+
+
+def overall_analysis_prompt(system: str, metrics_text: str) -> str:
     prompt = f'''
 You are a strategic analyst reviewing an overall {system} experiment across cohorts.
 
 System: {system}
 
-Metrics:
 {metrics_text}
 
 Return only a valid JSON object with these fields:
@@ -59,18 +86,22 @@ Instructions for scalability_verdict:
 
 Only output a single valid JSON object. No explanations, no markdown, no extra text. 
 '''
+    return prompt
 
-    
+
+async def run_overall_analysis_agent(
+    df: pd.DataFrame, system: str, llm_client: Any = None, bypass_llm_cache: bool = False,
+    config: Optional[ConfigSnapshot] = None,
+) -> dict:
+    # Building the prompt is pandas work, keep it off the event loop
+    report = PromptReport()
+    prompt = await asyncio.to_thread(build_overall_prompt, df, system, config, report)
+    # The token report is only logged, so it is tokenized in a thread without holding up the reply
+    asyncio.get_running_loop().run_in_executor(None, report.summary).add_done_callback(log_prompt_report)
 
     try:
-        openai.api_key = os.environ.get("OPENAI_API_KEY")
-        response = openai.chat.completions.create(
-            model="o3-mini", 
-            messages=[{"role": "user", "content": prompt}],
-            # temperature=0.2,
-            # max_tokens=512,
-        )
-        content = response.choices[0].message.content
+        use_cache = LLM_CACHE_ENABLED and not bypass_llm_cache
+        content = await complete_prompt(llm_client, prompt, use_cache=use_cache, cache_if=safe_parse_llm_json)
         print(content)
         parsed = safe_parse_llm_json(content)
         # Fallback for scalability_verdict if it's a string
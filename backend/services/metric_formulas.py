@@ -0,0 +1,243 @@
+import re
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Shorthand multipliers used in metric_config formulas, e.g. "10M x Bid Price"
+SUFFIXES = {"K": 1e3, "M": 1e6, "B": 1e9}
+
+_TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<ref>\{\d+\})"
+    r"|(?P<num>\d+(?:\.\d+)?)(?P<suffix>[KMB])?(?![A-Za-z0-9])"
+    r"|(?P<op>[-+*/()×])"
+    r"|(?P<mul>[xX])(?=\s|\d|\{|\()"
+    r"|(?P<name>[A-Za-z_%](?:(?!\s[xX×]\s)[\w%.,=' ])*(?:\([^()]*\))?)"
+    r")"
+)
+
+
+def metric_key(name: str) -> str:
+    """Config and Konom spell some names with different spacing, e.g. '( HB Provider Response )'."""
+    name = re.sub(r"\s*([()])\s*", r"\1", str(name))
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+
+def base_name(name: str) -> str:
+    """Name without its trailing source qualifier: 'Impressions Delivered (HB Rendered Ad)' -> 'Impressions Delivered'."""
+    return re.sub(r"\s*\([^()]*\)\s*$", "", str(name)).strip()
+
+
+def looks_like_ratio(name: str) -> bool:
+    """Rates and percentages: not additive, and meaningless without a denominator."""
+    return "%" in name or "rate" in name.lower()
+
+
+class Formula:
+    """
+    A parsed metric formula over named inputs. Supports + - * / (x and × as multiply),
+    parentheses and numbers with K/M/B suffixes. `missing` lists the names that did not
+    match any known metric. evaluate() returns None when an input has no value or a
+    denominator is zero.
+    """
+
+    def __init__(self, text: str, inputs: List[str], ast: Tuple, missing: List[str] = ()):
+        self.text = text
+        self.inputs = inputs
+        self.missing = list(missing)
+        self._ast = ast
+
+    def ratio(self) -> Optional[Tuple["Formula", "Formula"]]:
+        """(numerator, denominator) when the formula is a division at the top level."""
+        if self._ast[0] != "bin" or self._ast[1] != "/":
+            return None
+        return self._part(self._ast[2]), self._part(self._ast[3])
+
+    def _part(self, ast: Tuple) -> "Formula":
+        names = set()
+
+        def walk(node):
+            if node[0] == "ref":
+                names.add(node[1])
+            for child in node[1:]:
+                if isinstance(child, tuple):
+                    walk(child)
+        walk(ast)
+        return Formula(self.text, [n for n in self.inputs if n in names], ast,
+                       [n for n in self.missing if n in names])
+
+    @property
+    def has_division(self) -> bool:
+        def walk(node):
+            if node[0] == "bin":
+                return node[1] == "/" or walk(node[2]) or walk(node[3])
+            if node[0] == "neg":
+                return walk(node[1])
+            return False
+        return walk(self._ast)
+
+    def evaluate(self, values: Dict[str, Any]) -> Optional[float]:
+        try:
+            return self._eval(self._ast, values)
+        except (KeyError, TypeError, ZeroDivisionError):
+            return None
+
+    def compile(self) -> Callable[[Mapping[str, Any]], Any]:
+        """
+        The formula as one function over whole columns (numpy arrays keyed by input name),
+        built once; evaluating it costs a few numpy operations, nothing per row. Zero
+        denominators give NaN.
+        """
+        return _compile(self._ast)
+
+    def _eval(self, node, values):
+        kind = node[0]
+        if kind == "num":
+            return node[1]
+        if kind == "ref":
+            value = values[node[1]]
+            return None if value is None else float(value)
+        if kind == "neg":
+            return -self._eval(node[1], values)
+        op, left, right = node[1], self._eval(node[2], values), self._eval(node[3], values)
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        return left / right
+
+
+def _safe_divide(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quotient = np.divide(numerator, denominator)
+    return np.where(np.equal(denominator, 0), np.nan, quotient)
+
+
+_ARRAY_OPS = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": _safe_divide}
+
+
+def _compile(node) -> Callable[[Mapping[str, Any]], Any]:
+    kind = node[0]
+    if kind == "num":
+        value = node[1]
+        return lambda columns: value
+    if kind == "ref":
+        name = node[1]
+        return lambda columns: columns[name]
+    if kind == "neg":
+        operand = _compile(node[1])
+        return lambda columns: np.negative(operand(columns))
+    op, left, right = _ARRAY_OPS[node[1]], _compile(node[2]), _compile(node[3])
+    return lambda columns: op(left(columns), right(columns))
+
+
+def _substitute_names(text: str, names: Sequence[str]) -> Tuple[str, List[str]]:
+    """Replaces every known metric name (full, or without its qualifier) with a {i} placeholder."""
+    aliases = {}
+    for name in names:
+        aliases.setdefault(metric_key(name), name)
+        aliases.setdefault(metric_key(base_name(name)), name)
+    # Longest first, so 'Bid Price (HB Rendered Ad)' wins over 'Bid Price'
+    inputs: List[str] = []
+    for alias in sorted(aliases, key=len, reverse=True):
+        if not alias:
+            continue
+        body = re.escape(alias).replace(r"\ ", r"\s+").replace(r"\(", r"\s*\(\s*").replace(r"\)", r"\s*\)")
+        pattern = re.compile(r"(?<![\w])" + body + r"(?![\w])", re.I)
+
+        def replace(match, name=aliases[alias]):
+            if name not in inputs:
+                inputs.append(name)
+            return f" {{{inputs.index(name)}}} "
+
+        text = pattern.sub(replace, text)
+    return text, inputs
+
+
+def parse_formula(text: str, names: Sequence[str]) -> Optional[Formula]:
+    """
+    Parses a metric_config formula against the metric names available. Names that match
+    none of them are kept as inputs and listed in `missing`. Returns None when the formula
+    is not well formed.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None
+    substituted, inputs = _substitute_names(text, names)
+
+    tokens = []
+    missing: List[str] = []
+    pos = 0
+    while pos < len(substituted):
+        if substituted[pos:].strip() == "":
+            break
+        match = _TOKEN.match(substituted, pos)
+        if not match or match.end() == pos:
+            return None  # an unknown symbol
+        if match.group("ref"):
+            tokens.append(("ref", inputs[int(match.group("ref")[1:-1])]))
+        elif match.group("num"):
+            tokens.append(("num", float(match.group("num")) * SUFFIXES.get(match.group("suffix"), 1)))
+        elif match.group("mul"):
+            tokens.append(("op", "*"))
+        elif match.group("name"):
+            name = match.group("name").strip()
+            if name not in missing:
+                missing.append(name)
+            inputs.append(name)
+            tokens.append(("ref", name))
+        else:
+            op = match.group("op")
+            tokens.append(("op", "*" if op == "×" else op))
+        pos = match.end()
+
+    try:
+        ast, rest = _parse_sum(tokens)
+    except (IndexError, ValueError):
+        return None
+    if rest:
+        return None
+    return Formula(text, list(dict.fromkeys(inputs)), ast, missing)
+
+
+def _parse_sum(tokens):
+    node, tokens = _parse_product(tokens)
+    while tokens and tokens[0] in (("op", "+"), ("op", "-")):
+        op = tokens[0][1]
+        right, tokens = _parse_product(tokens[1:])
+        node = ("bin", op, node, right)
+    return node, tokens
+
+
+def _parse_product(tokens):
+    node, tokens = _parse_unary(tokens)
+    while tokens and tokens[0] in (("op", "*"), ("op", "/")):
+        op = tokens[0][1]
+        right, tokens = _parse_unary(tokens[1:])
+        node = ("bin", op, node, right)
+    return node, tokens
+
+
+def _parse_unary(tokens):
+    if tokens[0] == ("op", "-"):
+        node, tokens = _parse_unary(tokens[1:])
+        return ("neg", node), tokens
+    if tokens[0] == ("op", "("):
+        node, tokens = _parse_sum(tokens[1:])
+        if not tokens or tokens[0] != ("op", ")"):
+            raise ValueError("unbalanced parentheses")
+        return node, tokens[1:]
+    kind, value = tokens[0]
+    if kind not in ("num", "ref"):
+        raise ValueError(f"unexpected {value}")
+    return (kind, value), tokens[1:]
+
+
+def find_formula(metric_config: dict, name: str) -> Optional[str]:
+    """The formula metric_config gives for a metric, matched the same way as prompt columns."""
+    key = metric_key(name)
+    for config_name, spec in metric_config.items():
+        if metric_key(config_name) == key and isinstance(spec, dict):
+            return spec.get("formula")
+    return None
@@ -1,70 +1,41 @@
 import pandas as pd
 import logging
-from typing import Any
+from typing import Optional
+from config.config_manager import ConfigSnapshot, current_config
+from services.derived_metrics import derive_metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    try:
-        logger.info("Starting dataframe preprocessing")
-        logger.info(f"Initial columns: {df.columns.tolist()}")
-        
-        # Strip whitespace from column names
-        df = df.rename(columns=lambda x: x.strip() if isinstance(x, str) else x)
-        logger.info("Stripped whitespace from column names")
-
-        # Convert numeric columns to float type
-        numeric_columns = df.select_dtypes(include=['float', 'int']).columns
-        logger.info(f"Numeric columns found: {numeric_columns.tolist()}")
-        
-        for col in numeric_columns:
-            try:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                logger.info(f"Converted column {col} to numeric")
-            except Exception as e:
-                logger.error(f"Error converting column {col} to numeric: {str(e)}")
-                raise
-
-        # Add Cost column (if 'Total Requests Sent' exists)
-        if 'Total Requests Sent (HB Provider Response)' in df.columns:
-            try:
-                df['Cost'] = df['Total Requests Sent (HB Provider Response)'].astype(float) * 0.025 / 1_000_000
-                logger.info("Added Cost column")
-            except Exception as e:
-                logger.error(f"Error calculating Cost: {str(e)}")
-                df['Cost'] = 0.0
-        else:
-            logger.info("Total Requests Sent not found, setting Cost to 0")
-            df['Cost'] = 0.0
-
-        # Add Net Profit column (if 'Profit' exists)
-        if 'Profit (HB Rendered Ad)' in df.columns:
-            try:
-                df['Net Profit'] = df['Profit (HB Rendered Ad)'].astype(float) - df['Cost']
-                logger.info("Added Net Profit column")
-            except Exception as e:
-                logger.error(f"Error calculating Net Profit: {str(e)}")
-                df['Net Profit'] = -df['Cost']
-        else:
-            logger.info("Profit not found, setting Net Profit to -Cost")
-            df['Net Profit'] = -df['Cost']
+# Helper columns not required for metric analysis
+HELPER_COLUMNS = ['Helper1', 'Helper2', 'Temp', 'Debug']
 
-        # Round all numeric columns to 2 decimal places
-        for col in df.select_dtypes(include=['float', 'int']).columns:
-            df[col] = df[col].round(2)
-        logger.info("Rounded numeric columns")
 
-        # Drop helper columns not required for metric analysis
-        helper_cols = [col for col in ['Helper1', 'Helper2', 'Temp', 'Debug'] if col in df.columns]
+def preprocess_dataframe(df: pd.DataFrame, config: Optional[ConfigSnapshot] = None) -> pd.DataFrame:
+    """
+    Strips column names, drops helper columns, adds the derived metrics (Cost, Net Profit
+    and any metric_config formula the data lacks) and rounds every numeric column to 2
+    decimals. The parser has already typed the columns, so this works on whole blocks
+    rather than column by column, and never modifies the frame passed in.
+    """
+    try:
+        df = df.set_axis([c.strip() if isinstance(c, str) else c for c in df.columns], axis=1)
+        helper_cols = [col for col in HELPER_COLUMNS if col in df.columns]
         if helper_cols:
             df = df.drop(columns=helper_cols)
-            logger.info(f"Dropped helper columns: {helper_cols}")
 
-        logger.info("Preprocessing completed successfully")
+        derived = derive_metrics(df, (config or current_config()).metric_config)
+
+        # One block-wise rounding pass over the numeric columns, derived ones included
+        df = df.assign(**derived).round(2)
+
+        logger.info(
+            f"Preprocessed {len(df)} rows x {len(df.columns)} columns "
+            f"(derived: {list(derived)}, dropped helpers: {helper_cols})"
+        )
         return df
 
     except Exception as e:
         logger.error(f"Error in preprocessing: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Callable, Dict, List, Sequence
+
+from utils.llm_utils import LLM_MODEL
+from services.metric_formulas import metric_key
+
+logger = logging.getLogger(__name__)
+
+# Per-call input budget for the metric table part of a prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+
+ID_COLUMNS = ["Experiment Tokens"]
+PCT_PREFIX = "% Change in "
+
+_encoder = None
+_encoder_lock = threading.Lock()
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """tiktoken encoder for LLM_MODEL, or None when tiktoken or its BPE files are unavailable."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        with _encoder_lock:
+            if not _encoder_loaded:
+                try:
+                    import tiktoken
+                    try:
+                        _encoder = tiktoken.encoding_for_model(LLM_MODEL)
+                    except KeyError:
+                        _encoder = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.info(f"tiktoken unavailable ({type(e).__name__}), estimating tokens from length")
+                    _encoder = None
+                _encoder_loaded = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English and numbers
+    return math.ceil(len(text) / 4)
+
+
+def select_columns(columns: Sequence[str], metric_config: dict, keep: Sequence[str] = ()) -> List[str]:
+    """
+    Columns worth sending: the given dimension columns, experiment tokens, metrics defined
+    in metric_config and their '% Change in' columns. Falls back to every column when the
+    config matches none of the metrics, rather than sending an empty table.
+    """
+    known = {metric_key(name) for name in metric_config}
+    keep = set(keep) | set(ID_COLUMNS)
+    metrics = [c for c in columns if metric_key(c) in known]
+    if not metrics:
+        return list(columns)
+    kept_metrics = {metric_key(c) for c in metrics}
+    selected = []
+    for col in columns:
+        if col in keep or metric_key(col) in kept_metrics:
+            selected.append(col)
+        elif col.startswith(PCT_PREFIX) and metric_key(col[len(PCT_PREFIX):]) in kept_metrics:
+            selected.append(col)
+    return selected
+
+
+def metric_definitions(metric_config: dict, columns: Sequence[str]) -> Dict[str, str]:
+    """Definition text for the metrics that actually appear in the table."""
+    present = {metric_key(c) for c in columns}
+    definitions = {}
+    for name, spec in metric_config.items():
+        if metric_key(name) not in present or not isinstance(spec, dict):
+            continue
+        parts = [spec.get("description") or "", f"formula: {spec['formula']}" if spec.get("formula") else ""]
+        text = "; ".join(p for p in parts if p)
+        if text:
+            definitions[name] = text
+    return definitions
+
+
+def _cell(value: Any) -> Any:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return value
+
+
+def encode_table(records: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+    """CSV with a header row: the column names are written once instead of once per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([_cell(record.get(col)) for col in columns])
+    return buffer.getvalue().rstrip("\n")
+
+
+def _summarise_rows(records: List[Dict[str, Any]], columns: Sequence[str]) -> str:
+    means = []
+    for col in columns:
+        values = [r.get(col) for r in records]
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool) and not math.isnan(v)]
+        if numbers and len(numbers) == len(values):
+            means.append(f"{col}={sum(numbers) / len(numbers):.2f}")
+    summary = f"({len(records)} more rows omitted to fit the token budget"
+    return summary + (f"; their means: {', '.join(means)})" if means else ")")
+
+
+def fit_table(records: List[Dict[str, Any]], columns: Sequence[str], budget: int = PROMPT_TOKEN_BUDGET):
+    """
+    Encodes the table, keeping as many leading rows as fit in `budget` tokens and replacing
+    the rest with a one-line summary. Returns (text, rows_dropped).
+    """
+    text = encode_table(records, columns)
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text, 0
+
+    def encoded(n: int) -> str:
+        return encode_table(records[:n], columns) + "\n" + _summarise_rows(records[n:], columns)
+
+    # Largest number of leading rows that still fits
+    lo, hi = 0, len(records) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(encoded(mid)) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return encoded(lo), len(records) - lo
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+class PromptReport:
+    """
+    Token accounting for one request: what each prompt would have cost with the old
+    indented-JSON encoding against what was actually sent. record() only keeps the prompt
+    and a callable that renders its baseline; both are tokenized in summary(), which
+    callers run in a worker thread so the report stays off the request's hot path.
+    "tokens_estimated" is 1 when tiktoken is unavailable and counts are length / 4.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self.calls = 0
+        self.baseline_tokens = 0
+        self.prompt_tokens = 0
+        self.rows_dropped = 0
+        self.columns_dropped = 0
+
+    def record(self, baseline: Callable[[], str], prompt: str, rows_dropped: int = 0, columns_dropped: int = 0):
+        with self._lock:
+            self._pending.append((baseline, prompt))
+            self.calls += 1
+            self.rows_dropped += rows_dropped
+            # Every prompt of a request is built from the same column selection
+            self.columns_dropped = max(self.columns_dropped, columns_dropped)
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        baseline_tokens = sum(count_tokens(baseline()) for baseline, _ in pending)
+        prompt_tokens = sum(count_tokens(prompt) for _, prompt in pending)
+        with self._lock:
+            self.baseline_tokens += baseline_tokens
+            self.prompt_tokens += prompt_tokens
+            return {
+                "calls": self.calls,
+                "baseline_tokens": self.baseline_tokens,
+                "prompt_tokens": self.prompt_tokens,
+                "tokens_saved": self.baseline_tokens - self.prompt_tokens,
+                "rows_dropped": self.rows_dropped,
+                "columns_dropped": self.columns_dropped,
+                "tokens_estimated": int(_get_encoder() is None),
+            }
+
+
+def plan_batches(items: Sequence[Any], costs: Sequence[int], budget: int, max_size: int) -> List[List[Any]]:
+    """
+    Packs items in order into batches of at most max_size whose summed cost stays within
+    budget. An item that alone exceeds the budget gets a batch of its own.
+    """
+    batches, current, used = [], [], 0
+    for item, cost in zip(items, costs):
+        if current and (len(current) >= max_size or used + cost > budget):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,309 @@
+import json
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from utils.disk_cache import CACHE_DIR
+from services.konom_query import canonical_request_key
+from services.konom_incremental import parse_time
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "1") == "1"
+RESULT_RETENTION_DAYS = float(os.getenv("RESULT_RETENTION_DAYS", "90"))
+RESULT_STORE_MAX_MB = int(os.getenv("RESULT_STORE_MAX_MB", "2048"))
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+
+# Frame columns whose values index a result
+TOKEN_COLUMN = "Experiment Tokens"
+PROVIDER_COLUMNS = ["Provider Name", "Provider Group Name"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    system TEXT,
+    dimensions TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    config_version INTEGER,
+    request_json TEXT NOT NULL,
+    result TEXT NOT NULL,
+    frame_rows INTEGER,
+    frame_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS result_index (
+    result_id TEXT NOT NULL REFERENCES results(id) ON DELETE CASCADE,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (field, value, result_id)
+);
+CREATE INDEX IF NOT EXISTS results_window ON results (start_time, end_time);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used_at);
+CREATE INDEX IF NOT EXISTS result_index_result ON result_index (result_id);
+"""
+
+SUMMARY_COLUMNS = "id, kind, request_hash, system, dimensions, start_time, end_time, config_version, frame_rows, frame_bytes, created_at, last_used_at"
+
+
+def utc_text(value: Any) -> str:
+    """A Konom time as a sortable UTC string; ValueError when it does not parse."""
+    parsed = parse_time(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time: {value!r}")
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def request_window(request_json: dict):
+    """(start, end) covering the request's 'times' windows, or (None, None)."""
+    windows = [w for w in request_json.get("times") or [] if isinstance(w, dict)]
+    try:
+        starts = [utc_text(w.get("startTime")) for w in windows]
+        ends = [utc_text(w.get("endTime")) for w in windows]
+    except ValueError:
+        return None, None
+    if not windows:
+        return None, None
+    return min(starts), max(ends)
+
+
+def result_id(kind: str, request_json: dict, system: Optional[str], dimensions: List[str]) -> str:
+    """Re-running the same analysis replaces its stored result rather than adding another."""
+    payload = json.dumps({"kind": kind, "request": canonical_request_key(request_json),
+                          "system": system, "dimensions": list(dimensions)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _index_values(df: Optional[pd.DataFrame]) -> List[tuple]:
+    if df is None:
+        return []
+    values = []
+    for field, columns in (("experiment_token", [TOKEN_COLUMN]), ("provider", PROVIDER_COLUMNS)):
+        for col in columns:
+            if col in df.columns:
+                values.extend((field, str(v)) for v in pd.unique(df[col]) if pd.notna(v) and v != 0)
+    return list(dict.fromkeys(values))
+
+
+class ResultStore:
+    """
+    Past analyses on local disk: one SQLite row per result (request, system, dimensions,
+    time window and the LLM verdicts as JSON), indexed by experiment token and provider,
+    and the prepared DataFrame as a Parquet file next to it. Results not opened for
+    retention_days are deleted, and the least recently used go first once the frames
+    exceed max_bytes.
+    """
+
+    def __init__(self, directory: str = RESULTS_DIR, retention_days: float = RESULT_RETENTION_DAYS,
+                 max_bytes: int = RESULT_STORE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    os.makedirs(os.path.join(self.directory, "frames"), exist_ok=True)
+                    with sqlite3.connect(os.path.join(self.directory, "results.sqlite")) as conn:
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        conn.executescript(SCHEMA)
+                    self._ready = True
+        conn = sqlite3.connect(os.path.join(self.directory, "results.sqlite"), timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _frame_path(self, rid: str) -> str:
+        return os.path.join(self.directory, "frames", f"{rid}.parquet")
+
+    def _remove_frames(self, ids: List[str]):
+        for rid in ids:
+            try:
+                os.remove(self._frame_path(rid))
+            except OSError:
+                pass
+
+    def put(self, kind: str, request_json: dict, system: Optional[str], dimensions: List[str],
+            df: Optional[pd.DataFrame], result: Any, config_version: Optional[int] = None) -> str:
+        rid = result_id(kind, request_json, system, dimensions)
+        start, end = request_window(request_json)
+        frame_bytes, frame_rows = 0, None
+        conn = self._connect()  # creates the frames directory on first use
+        try:
+            if df is not None:
+                path = self._frame_path(rid)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    df.to_parquet(tmp_path, index=False)
+                    os.replace(tmp_path, path)
+                    frame_bytes, frame_rows = os.path.getsize(path), len(df)
+                except (ImportError, OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Storing result {rid[:12]} without its frame: {e}")
+                    self._remove_frames([rid])
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+            now = time.time()
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO results ({SUMMARY_COLUMNS}, request_json, result) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (rid, kind, canonical_request_key(request_json), system, json.dumps(list(dimensions)), start, end,
+                     config_version, frame_rows, frame_bytes, now, now,
+                     json.dumps(request_json, default=str), json.dumps(jsonable_encoder(result))),
+                )
+                conn.execute("DELETE FROM result_index WHERE result_id = ?", (rid,))
+                conn.executemany("INSERT INTO result_index (result_id, field, value) VALUES (?, ?, ?)",
+                                 [(rid, field, value) for field, value in _index_values(df)])
+        finally:
+            conn.close()
+        self.prune()
+        return rid
+
+    def _summary(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict[str, Any]:
+        summary = {key: row[key] for key in row.keys() if key not in ("request_json", "result")}
+        summary["dimensions"] = json.loads(row["dimensions"])
+        index = conn.execute("SELECT field, value FROM result_index WHERE result_id = ? ORDER BY field, value",
+                             (row["id"],)).fetchall()
+        summary["experiment_tokens"] = [value for field, value in index if field == "experiment_token"]
+        summary["providers"] = [value for field, value in index if field == "provider"]
+        return summary
+
+    def search(self, experiment_token: Optional[str] = None, provider: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None, system: Optional[str] = None,
+               kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Summaries of stored results, newest first. start/end select results whose time
+        window overlaps them; a time that does not parse raises ValueError.
+        """
+        clauses, params = [], []
+        for field, value in (("experiment_token", experiment_token), ("provider", provider)):
+            if value is not None:
+                clauses.append("id IN (SELECT result_id FROM result_index WHERE field = ? AND value = ?)")
+                params += [field, value]
+        for column, value in (("system", system), ("kind", kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("end_time > ?")
+            params.append(utc_text(start))
+        if end is not None:
+            clauses.append("start_time < ?")
+            params.append(utc_text(end))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f"SELECT {SUMMARY_COLUMNS} FROM results {where} ORDER BY created_at DESC LIMIT ?",
+                                params + [limit]).fetchall()
+            return [self._summary(conn, row) for row in rows]
+        finally:
+            conn.close()
+
+    def get(self, rid: str, include_frame: bool = False) -> Optional[Dict[str, Any]]:
+        """The stored result with its request and verdicts (and the frame's records when asked), or None."""
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT * FROM results WHERE id = ?", (rid,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE results SET last_used_at = ? WHERE id = ?", (time.time(), rid))
+            stored = self._summary(conn, row)
+        finally:
+            conn.close()
+        stored["request_json"] = json.loads(row["request_json"])
+        stored["result"] = json.loads(row["result"])
+        if include_frame:
+            stored["frame"] = self.frame_records(rid)
+        return stored
+
+    def load_frame(self, rid: str) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_parquet(self._frame_path(rid))
+        except (ImportError, OSError, ValueError) as e:
+            logger.info(f"No stored frame for result {rid[:12]}: {e}")
+            return None
+
+    def frame_records(self, rid: str) -> Optional[List[Dict[str, Any]]]:
+        """The stored frame as JSON-ready records, or None."""
+        df = self.load_frame(rid)
+        if df is None:
+            return None
+        # float32 measures are widened so their rounded values serialize as such
+        narrow = df.select_dtypes("float32").columns
+        if len(narrow):
+            df = df.astype(dict.fromkeys(narrow, "float64")).round(dict.fromkeys(narrow, 2))
+        return df.to_dict(orient="records")
+
+    def delete(self, rid: str) -> bool:
+        conn = self._connect()
+        try:
+            with conn:
+                deleted = conn.execute("DELETE FROM results WHERE id = ?", (rid,)).rowcount
+        finally:
+            conn.close()
+        self._remove_frames([rid])
+        return bool(deleted)
+
+    def prune(self) -> int:
+        """Applies the retention policy; returns how many results were deleted."""
+        cutoff = time.time() - self.retention_days * 86400
+        conn = self._connect()
+        try:
+            with conn:
+                expired = [r[0] for r in conn.execute("SELECT id FROM results WHERE last_used_at < ?", (cutoff,))]
+                rows = conn.execute("SELECT id, frame_bytes FROM results WHERE last_used_at >= ? "
+                                    "ORDER BY last_used_at", (cutoff,)).fetchall()
+                total = sum(size for _, size in rows)
+                evicted = []
+                for rid, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append(rid)
+                    total -= size
+                removed = expired + evicted
+                conn.executemany("DELETE FROM results WHERE id = ?", [(rid,) for rid in removed])
+        finally:
+            conn.close()
+        self._remove_frames(removed)
+        if removed:
+            logger.info(f"Result store removed {len(expired)} expired and {len(evicted)} evicted results")
+        return len(removed)
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        try:
+            entries, frame_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(frame_bytes), 0) FROM results").fetchone()
+        finally:
+            conn.close()
+        return {"entries": entries, "bytes": frame_bytes, "max_bytes": self.max_bytes,
+                "retention_days": self.retention_days}
+
+
+result_store = ResultStore()
+
+
+def record_result(kind: str, request_json: dict, system: Optional[str], dimensions: List[str],
+                  df: Optional[pd.DataFrame], result: Any, config_version: Optional[int] = None) -> Optional[str]:
+    """Stores a finished analysis; a failure is logged, never raised, since the caller already has its answer."""
+    if not RESULT_STORE_ENABLED:
+        return None
+    try:
+        return result_store.put(kind, request_json, system, dimensions, df, result, config_version)
+    except Exception as e:
+        logger.warning(f"Could not store {kind} result: {e}")
+        return None
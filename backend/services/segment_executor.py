@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be tuned per deployment without code changes
+MAX_IN_FLIGHT = int(os.getenv("DEEP_DIVE_MAX_IN_FLIGHT", "4"))
+CALL_TIMEOUT = float(os.getenv("DEEP_DIVE_CALL_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("DEEP_DIVE_MAX_RETRIES", "3"))
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for OpenAI RateLimitError or anything carrying an HTTP 429 status."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    return type(exc).__name__ == "RateLimitError"
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if is_rate_limit_error(exc) or isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Reads the Retry-After header from an API error response, if there is one."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class SegmentExecutor:
+    """
+    Runs one async worker per item with at most `max_in_flight` calls outstanding.
+    Each call gets `call_timeout` seconds; rate-limit and transient failures are retried
+    with jittered exponential backoff, and a 429 pauses every worker until the
+    Retry-After window has passed. Results come back in input order, with the final
+    exception in place of the result for items that never succeeded.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        call_timeout: float = CALL_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        base_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.call_timeout = call_timeout
+        self.max_retries = max(0, max_retries)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._resume_at = 0.0
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        delay = retry_after_seconds(exc)
+        if delay is None:
+            delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+    async def _wait_for_cooldown(self):
+        loop = asyncio.get_running_loop()
+        remaining = self._resume_at - loop.time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def _run_one(self, worker: Callable[[Any], Awaitable[Any]], item: Any, semaphore: asyncio.Semaphore) -> Any:
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            await self._wait_for_cooldown()
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(worker(item), timeout=self.call_timeout)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable_error(e):
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if is_rate_limit_error(e):
+                        # Hold back every worker, not just this one
+                        self._resume_at = max(self._resume_at, loop.time() + delay)
+                    logger.warning(f"Segment call failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def map(
+        self,
+        worker: Callable[[Any], Awaitable[Any]],
+        items: Sequence[Any],
+        on_result: Optional[Callable[[int, Any], Awaitable[None]]] = None,
+    ) -> List[Any]:
+        """
+        Results in input order. on_result(index, result) is awaited as soon as each item
+        finishes, so callers can act on early results while the rest are still running.
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def run(index: int, item: Any) -> Any:
+            try:
+                result = await self._run_one(worker, item, semaphore)
+            except Exception as e:
+                result = e
+            if on_result is not None:
+                await on_result(index, result)
+            return result
+
+        return await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
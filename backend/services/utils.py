@@ -1,93 +1,166 @@
 import pandas as pd
-from typing import List
+import numpy as np
+from typing import List, Optional, Tuple
 import re
 
-def enhance_with_percentage_changes(df: pd.DataFrame) -> pd.DataFrame:
+CONTROL_KEYWORDS = ["control", "ctrl", "default", "def", "0", "-ctrl"]
+PCT_METRICS = [
+    "Bid Price (HB Rendered Ad)",
+    "Bidder Win Rate (1K)",
+    "Bidder Rev Rate (10M)",
+    "MNET Rev Rate (10M)",
+    "Profit (HB Rendered Ad)",
+]
+PRETTIFY_DOLLAR = ["Bid Price (HB Rendered Ad)", "Profit (HB Rendered Ad)"]
+PRETTIFY_2DEC = ["Bidder Win Rate (1K)", "Bidder Rev Rate (10M)", "MNET Rev Rate (10M)"]
+
+# Compiled once: (keyword, whole-word-or-after-separator pattern)
+_KEYWORD_PATTERNS = [(kw, re.compile(rf'(^|[:_\-]){re.escape(kw)}($|[:_\-])')) for kw in CONTROL_KEYWORDS]
+_TRAILING_ZERO = re.compile(r'[:_\-]0$')
+_INT64_LIMIT = 2.0 ** 63
+
+
+def control_score(token: str) -> int:
+    token = token.lower()
+    score = 0
+    for kw, pattern in _KEYWORD_PATTERNS:
+        # Prefer exact match for '0' or 'control' etc.
+        if token == kw:
+            score += 100
+        # End-of-string match for '0' (e.g., 'lessCtrl:0')
+        if kw == '0' and _TRAILING_ZERO.search(token):
+            score += 50
+        # Contains keyword as a whole word or after separator
+        if pattern.search(token):
+            score += 20
+        # Substring match (lowest priority)
+        if kw in token:
+            score += 5
+    return score
+
+
+def score_control_tokens(tokens: pd.Series) -> np.ndarray:
+    """Control score per row; each distinct token is scored once."""
+    codes, uniques = pd.factorize(tokens.astype(str), use_na_sentinel=False)
+    unique_scores = np.fromiter((control_score(t) for t in uniques), dtype=np.int64, count=len(uniques))
+    return unique_scores[codes]
+
+
+def _as_floats(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    float(v) for every cell as an array, plus a mask of the cells where float() succeeds.
+    Plain numpy numeric columns convert in one step; other columns go through
+    pd.to_numeric, and only the cells it could not read are retried with float().
+    """
+    if values.dtype.kind in "biuf":
+        return values.to_numpy(dtype=np.float64), np.ones(len(values), dtype=bool)
+    raw = values.to_numpy(dtype=object)
+    nums = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+    ok = ~np.isnan(nums)
+    for i in np.flatnonzero(~ok):
+        try:
+            nums[i] = float(raw[i])
+            ok[i] = True
+        except (ValueError, TypeError):
+            pass
+    return nums, ok
+
+
+def _format_2dec(values: np.ndarray) -> np.ndarray:
+    return np.char.mod("%.2f", values)
+
+
+def _pct_change_strings(nums: np.ndarray, ok: np.ndarray, control_values: np.ndarray) -> List[str]:
+    """% change of each row against its own control value; NaN or zero controls give ''."""
+    out = np.full(len(nums), "", dtype=object)
+    with np.errstate(invalid="ignore"):
+        valid = ok & ~np.isnan(nums) & ~np.isnan(control_values) & (control_values != 0)
+    if not valid.any():
+        return out.tolist()
+    control = control_values[valid]
+    with np.errstate(invalid="ignore", over="ignore"):
+        pct = 100 * (nums[valid] - control) / np.abs(control)
+    sign = np.where(pct >= 0, "+", "")
+    out[valid] = np.char.add(np.char.add(sign, _format_2dec(pct)), "%").tolist()
+    return out.tolist()
+
+
+def _prettify(values: pd.Series, nums: np.ndarray, ok: np.ndarray, dollar: bool) -> list:
+    out = values.to_numpy(dtype=object).copy()
+    if dollar:
+        # int(float(v)) fails on NaN/inf, which keep their original value
+        mask = ok & np.isfinite(nums)
+        small = mask & (np.abs(nums) < _INT64_LIMIT)
+        ints = np.trunc(nums[small]).astype(np.int64).tolist()
+        out[small] = [f"${v:,}" for v in ints]
+        for i in np.flatnonzero(mask & ~small):
+            out[i] = f"${int(nums[i]):,}"
+    else:
+        out[ok] = _format_2dec(nums[ok]).tolist()
+    return out.tolist()
+
+
+def control_positions(df: pd.DataFrame, group_cols: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Row position of the control bucket each row is compared against, or -1 where there
+    is none. Without group_cols there is one control for the whole frame; with them,
+    each dimension combination gets the best-scoring token of its own rows, found for
+    all groups at once with a single groupby/transform.
+    """
+    scores = score_control_tokens(df['Experiment Tokens'])
+    if not group_cols:
+        if len(scores) == 0 or scores.max() == 0:
+            return np.full(len(scores), -1, dtype=np.int64)
+        return np.full(len(scores), int(np.argmax(scores)), dtype=np.int64)
+
+    by_group = pd.Series(scores).groupby(
+        [df[col].to_numpy() for col in group_cols], sort=False, dropna=False
+    )
+    best = by_group.transform("idxmax").to_numpy(dtype=np.int64)
+    has_control = by_group.transform("max").to_numpy() > 0
+    return np.where(has_control, best, -1)
+
+
+def enhance_with_percentage_changes(df: pd.DataFrame, group_cols: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Adds % change columns for selected metrics, comparing each bucket to the control group.
     Control group is identified by parsing all rows in 'Experiment Tokens' for defined control keywords.
     The best match is chosen by scoring: prefer exact or end-of-string matches for '0', 'control', etc.
+    With group_cols (the deep-dive dimensions) the control is picked inside each dimension
+    combination, so every segment is compared against its own baseline.
     Also prettifies key metric values and adds a single '%Change' column for the primary metric.
+    Works column-at-a-time on numpy arrays; output matches the original per-row version exactly.
     """
     if 'Experiment Tokens' not in df.columns:
         return df
 
-    control_keywords = ["control", "ctrl", "default", "def", "0", "-ctrl"]
-    metrics = [
-        "Bid Price (HB Rendered Ad)",
-        "Bidder Win Rate (1K)",
-        "Bidder Rev Rate (10M)",
-        "MNET Rev Rate (10M)",
-        "Profit (HB Rendered Ad)",
-    ]
-    prettify_dollar = ["Bid Price (HB Rendered Ad)", "Profit (HB Rendered Ad)"]
-    prettify_2dec = ["Bidder Win Rate (1K)", "Bidder Rev Rate (10M)", "MNET Rev Rate (10M)"]
-    primary_metric = metrics[0]  # Use the first metric as the primary for %Change column
-
-    def control_score(token: str) -> int:
-        token = token.lower()
-        score = 0
-        # Prefer exact match for '0' or 'control' etc.
-        for kw in control_keywords:
-            if token == kw:
-                score += 100
-            # End-of-string match for '0' (e.g., 'lessCtrl:0')
-            if kw == '0' and re.search(r'[:_\-]0$', token):
-                score += 50
-            # Contains keyword as a whole word or after separator
-            if re.search(rf'(^|[:_\-]){re.escape(kw)}($|[:_\-])', token):
-                score += 20
-            # Substring match (lowest priority)
-            if kw in token:
-                score += 5
-        return score
-
-    # Score all rows
-    scores = df['Experiment Tokens'].astype(str).apply(control_score)
-    if scores.max() == 0:
+    primary_metric = PCT_METRICS[0]  # Use the first metric as the primary for %Change column
+    group_cols = [c for c in (group_cols or []) if c in df.columns and c != 'Experiment Tokens']
+
+    positions = control_positions(df, group_cols)
+    has_control = positions >= 0
+    if not has_control.any():
         return df  # No control found
-    control_idx = scores.idxmax()
-    control_row = df.loc[control_idx]
 
     # Prettify and calculate % change for each metric
-    for metric in metrics:
+    for metric in PCT_METRICS:
         if metric not in df.columns:
             continue
-        control_value = control_row[metric]
-        # Try to convert control_value to float
-        try:
-            control_value = float(control_value)
-        except (ValueError, TypeError):
-            continue
         new_col = f"% Change in {metric}"
-        pct_changes = []
-        prettified = []
-        for val in df[metric]:
-            # % change calculation
-            try:
-                val_f = float(val)
-                if pd.isnull(val_f) or pd.isnull(control_value) or control_value == 0:
-                    pct = ""
-                else:
-                    pct_val = 100 * (val_f - control_value) / abs(control_value)
-                    sign = "+" if pct_val >= 0 else ""
-                    pct = f"{sign}{pct_val:.2f}%"
-            except (ValueError, TypeError):
-                pct = ""
-            pct_changes.append(pct)
-            # Prettify value
-            if metric in prettify_dollar:
-                try:
-                    prettified.append(f"${int(float(val)):,}")
-                except Exception:
-                    prettified.append(val)
-            elif metric in prettify_2dec:
-                try:
-                    prettified.append(f"{float(val):.2f}")
-                except Exception:
-                    prettified.append(val)
-            else:
-                prettified.append(val)
+        values = df[metric]
+        nums, ok = _as_floats(values)
+        # Control value per row; rows without a readable control get NaN (no % change)
+        control_ok = has_control & ok[np.maximum(positions, 0)]
+        if not group_cols and not control_ok[0]:
+            continue  # the single control value is not numeric, leave the metric alone
+        control_values = np.where(control_ok, nums[np.maximum(positions, 0)], np.nan)
+        pct_changes = _pct_change_strings(nums, ok, control_values)
+        if metric in PRETTIFY_DOLLAR:
+            prettified = _prettify(values, nums, ok, dollar=True)
+        elif metric in PRETTIFY_2DEC:
+            prettified = _prettify(values, nums, ok, dollar=False)
+        else:
+            prettified = values.tolist()
         df[metric] = prettified
         df[new_col] = pct_changes
 
@@ -96,4 +169,4 @@ def enhance_with_percentage_changes(df: pd.DataFrame) -> pd.DataFrame:
     if primary_pct_col in df.columns:
         df['%Change'] = df[primary_pct_col]
 
-    return df 
\ No newline at end of file
+    return df
@@ -0,0 +1,110 @@
+"""
+Frozen copy of the per-row enhance_with_percentage_changes that the vectorized version
+replaced, and the frames it is compared on. Do not change it to match new behaviour:
+tests/test_enhance.py and benchmarks/bench_enhance.py both measure against it.
+"""
+import re
+import numpy as np
+import pandas as pd
+from services.utils import PCT_METRICS
+
+
+def legacy_enhance(df: pd.DataFrame) -> pd.DataFrame:
+    if 'Experiment Tokens' not in df.columns:
+        return df
+
+    control_keywords = ["control", "ctrl", "default", "def", "0", "-ctrl"]
+    metrics = list(PCT_METRICS)
+    prettify_dollar = ["Bid Price (HB Rendered Ad)", "Profit (HB Rendered Ad)"]
+    prettify_2dec = ["Bidder Win Rate (1K)", "Bidder Rev Rate (10M)", "MNET Rev Rate (10M)"]
+    primary_metric = metrics[0]
+
+    def control_score(token: str) -> int:
+        token = token.lower()
+        score = 0
+        for kw in control_keywords:
+            if token == kw:
+                score += 100
+            if kw == '0' and re.search(r'[:_\-]0$', token):
+                score += 50
+            if re.search(rf'(^|[:_\-]){re.escape(kw)}($|[:_\-])', token):
+                score += 20
+            if kw in token:
+                score += 5
+        return score
+
+    scores = df['Experiment Tokens'].astype(str).apply(control_score)
+    if scores.max() == 0:
+        return df
+    control_idx = scores.idxmax()
+    control_row = df.loc[control_idx]
+
+    for metric in metrics:
+        if metric not in df.columns:
+            continue
+        control_value = control_row[metric]
+        try:
+            control_value = float(control_value)
+        except (ValueError, TypeError):
+            continue
+        new_col = f"% Change in {metric}"
+        pct_changes = []
+        prettified = []
+        for val in df[metric]:
+            try:
+                val_f = float(val)
+                if pd.isnull(val_f) or pd.isnull(control_value) or control_value == 0:
+                    pct = ""
+                else:
+                    pct_val = 100 * (val_f - control_value) / abs(control_value)
+                    sign = "+" if pct_val >= 0 else ""
+                    pct = f"{sign}{pct_val:.2f}%"
+            except (ValueError, TypeError):
+                pct = ""
+            pct_changes.append(pct)
+            if metric in prettify_dollar:
+                try:
+                    prettified.append(f"${int(float(val)):,}")
+                except Exception:
+                    prettified.append(val)
+            elif metric in prettify_2dec:
+                try:
+                    prettified.append(f"{float(val):.2f}")
+                except Exception:
+                    prettified.append(val)
+            else:
+                prettified.append(val)
+        df[metric] = prettified
+        df[new_col] = pct_changes
+
+    primary_pct_col = f"% Change in {primary_metric}"
+    if primary_pct_col in df.columns:
+        df['%Change'] = df[primary_pct_col]
+
+    return df
+
+
+def make_frame(n_rows: int, seed: int = 0, messy: bool = False) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    tokens = np.array(["lessCtrl:1", "lessCtrl:2", "lessCtrl:0", "lessCtrl:3"])
+    df = pd.DataFrame({
+        "Data center": rng.choice(["DC1", "DC2", "DC3"], n_rows),
+        "Experiment Tokens": tokens[np.arange(n_rows) % len(tokens)],
+    })
+    for metric in PCT_METRICS:
+        df[metric] = rng.normal(5e4, 4e4, n_rows).round(3)
+    if messy:
+        # Cells the per-row version treats specially: NaN, inf, zero, text, None, huge values
+        specials = [np.nan, np.inf, -np.inf, 0.0, -0.0, 1e25, "n/a", None, "12.5", -0.004]
+        for metric in PCT_METRICS[1:]:
+            col = df[metric].astype(object)
+            idx = rng.choice(n_rows, size=min(n_rows, 40), replace=False)
+            col.iloc[idx] = [specials[i % len(specials)] for i in range(len(idx))]
+            df[metric] = col
+    return df
+
+
+def per_segment_legacy(df: pd.DataFrame, group_cols: list) -> pd.DataFrame:
+    """What grouped baselines replace: one legacy pass per dimension combination."""
+    parts = [legacy_enhance(part.copy()) for _, part in df.groupby(group_cols, sort=False)]
+    return pd.concat(parts).loc[df.index]
@@ -0,0 +1,23 @@
+"""
+Frozen copy of the recursive extract_deepest_data that flatten_split_tree replaced.
+Do not change it to match new behaviour: tests/test_flatten.py and
+benchmarks/bench_flatten.py both measure against it.
+"""
+import pandas as pd
+
+
+def legacy_flatten(result: dict) -> pd.DataFrame:
+    rows = []
+
+    def extract(data, path=None):
+        if path is None:
+            path = []
+        if 'split' not in data:
+            rows.append({**dict(path), **data})
+            return
+        for sub_data in data['split']:
+            current_path = path + [(k, v) for k, v in data.items() if not isinstance(v, (dict, list))]
+            extract(sub_data, current_path)
+
+    extract(result)
+    return pd.DataFrame(rows)
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from services.derived_metrics import derive_metrics
+from services.metric_formulas import parse_formula
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUESTS = "Total Requests Sent (HB Provider Response)"
+PROFIT = "Profit (HB Rendered Ad)"
+BID_PRICE = "Bid Price (HB Rendered Ad)"
+IMPRESSIONS = "Impressions Delivered (HB Rendered Ad)"
+
+
+def bundled_metric_config():
+    with open(os.path.join(BACKEND_DIR, "configs", "metric_config.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+def frame(**columns):
+    return pd.DataFrame({"Experiment Tokens": ["lessCtrl:0", "lessCtrl:1", "lessCtrl:2"], **columns})
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("10M x Bid Price (HB Rendered Ad) / Total Requests Sent", 1e7 * 50 / 2000),
+    ("100000 x Impressions Delivered / Total Requests Sent", 1e5 * 40 / 2000),
+    ("2K × Bid Price - 1.5B / Total Requests Sent", 2e3 * 50 - 1.5e9 / 2000),
+    ("(Bid Price + Impressions Delivered) X 3", (50 + 40) * 3),
+])
+def test_parse_formula_suffixes_and_multiply(text, expected):
+    formula = parse_formula(text, [BID_PRICE, REQUESTS, IMPRESSIONS])
+    assert formula is not None and not formula.missing
+    assert formula.evaluate({BID_PRICE: 50, REQUESTS: 2000, IMPRESSIONS: 40}) == pytest.approx(expected)
+
+
+def test_parse_formula_lists_unknown_names_and_rejects_malformed():
+    formula = parse_formula("Valid Responses / Total Requests Sent", [REQUESTS])
+    assert formula.missing == ["Valid Responses"]
+    assert parse_formula("Bid Price / (Total Requests Sent", [BID_PRICE, REQUESTS]) is None
+
+
+def test_zero_denominator_gives_zero():
+    config = {"Bidder Win Rate (1K)": {"formula": "100000 x Impressions Delivered / Total Requests Sent"}}
+    df = frame(**{IMPRESSIONS: [10.0, 5.0, 0.0], REQUESTS: [1000.0, 0.0, 0.0]})
+    derived = derive_metrics(df, config)
+    np.testing.assert_array_equal(derived["Bidder Win Rate (1K)"], [1000.0, 0.0, 0.0])
+
+
+def test_fill_missing_stands_in_for_an_absent_input():
+    config = {
+        "Filled": {"formula": "Bid Price + Publisher Revenue", "fill_missing": 0},
+        "Unfilled": {"formula": "Bid Price + Publisher Revenue"},
+    }
+    derived = derive_metrics(frame(**{BID_PRICE: [1.0, 2.0, 3.0]}), config)
+    np.testing.assert_array_equal(derived["Filled"], [1.0, 2.0, 3.0])
+    assert "Unfilled" not in derived
+
+
+def test_dependency_cycle_is_skipped():
+    config = {
+        "Loop A": {"formula": "Loop B + 1"},
+        "Loop B": {"formula": "Loop A x 2"},
+        "Doubled": {"formula": "Bid Price x 2"},
+    }
+    derived = derive_metrics(frame(**{BID_PRICE: [1.0, 2.0, 3.0]}), config)
+    assert "Loop A" not in derived and "Loop B" not in derived
+    np.testing.assert_array_equal(derived["Doubled"], [2.0, 4.0, 6.0])
+
+
+def test_metric_konom_returned_is_untouched():
+    config = {
+        "Bidder Win Rate (1K)": {"formula": "100000 x Impressions Delivered / Total Requests Sent"},
+        "Win Per Request": {"formula": "Bidder Win Rate (1K) / 100000"},
+    }
+    df = frame(**{IMPRESSIONS: [10.0, 20.0, 30.0], REQUESTS: [1000.0, 1000.0, 1000.0],
+                  "Bidder Win Rate (1K)": [7.0, 8.0, 9.0]})
+    derived = derive_metrics(df, config)
+    assert "Bidder Win Rate (1K)" not in derived
+    # Dependants read Konom's value, not a recomputed one
+    np.testing.assert_allclose(derived["Win Per Request"], [7e-5, 8e-5, 9e-5])
+
+
+def hard_coded_cost_and_net_profit(df):
+    """What preprocess_dataframe computed before Cost and Net Profit became formulas."""
+    requests = df[REQUESTS].to_numpy(dtype=np.float64) if REQUESTS in df.columns else None
+    profit = df[PROFIT].to_numpy(dtype=np.float64) if PROFIT in df.columns else None
+    cost = requests * (0.025 / 1_000_000) if requests is not None else np.zeros(len(df))
+    return cost, (profit - cost if profit is not None else -cost)
+
+
+@pytest.mark.parametrize("columns", [
+    {REQUESTS: [1.2e6, 3.0e7, 0.0], PROFIT: [310.5, -12.25, 0.0]},
+    {REQUESTS: [1.2e6, 3.0e7, 0.0]},
+    {PROFIT: [310.5, -12.25, 0.0]},
+    {},
+])
+def test_cost_and_net_profit_match_the_hard_coded_version(columns):
+    df = frame(**columns)
+    derived = derive_metrics(df, bundled_metric_config())
+    cost, net_profit = hard_coded_cost_and_net_profit(df)
+    np.testing.assert_allclose(derived["Cost"], cost, rtol=1e-12)
+    np.testing.assert_allclose(derived["Net Profit"], net_profit, rtol=1e-12)
@@ -0,0 +1,30 @@
+import pandas as pd
+from services.utils import enhance_with_percentage_changes
+from tests.enhance_reference import legacy_enhance, make_frame, per_segment_legacy
+
+
+def golden_cases():
+    cases = [make_frame(500, seed, messy=True) for seed in range(20)]
+    cases.append(make_frame(500, 99))
+    zero_control = make_frame(50, 7)
+    zero_control.loc[zero_control["Experiment Tokens"] == "lessCtrl:0", "Bid Price (HB Rendered Ad)"] = 0.0
+    cases.append(zero_control)
+    cases.append(make_frame(50, 8).assign(**{"Experiment Tokens": "treatment"}))
+    return cases
+
+
+def test_matches_the_per_row_implementation():
+    for df in golden_cases():
+        expected = legacy_enhance(df.copy())
+        actual = enhance_with_percentage_changes(df.copy())
+        pd.testing.assert_frame_equal(expected, actual)
+
+
+def test_grouped_baselines_match_a_pass_per_segment():
+    df = make_frame(2000, 3)
+    # Each data center keeps its own control bucket under a different token
+    df.loc[(df["Data center"] == "DC2") & (df["Experiment Tokens"] == "lessCtrl:0"), "Experiment Tokens"] = "lessCtrl:4"
+    df.loc[(df["Data center"] == "DC2") & (df["Experiment Tokens"] == "lessCtrl:1"), "Experiment Tokens"] = "lessCtrl:control"
+    expected = per_segment_legacy(df, ["Data center"])
+    actual = enhance_with_percentage_changes(df.copy(), group_cols=["Data center"])
+    pd.testing.assert_frame_equal(expected.astype(object), actual[expected.columns].astype(object))
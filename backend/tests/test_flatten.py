@@ -0,0 +1,56 @@
+import random
+import pandas as pd
+import pytest
+from services.data_parser import flatten_split_tree
+from tests.flatten_reference import legacy_flatten
+
+KEYS = ["Data center", "Cookie Flag", "Country Code", "Experiment Tokens", "Bid Price", "Profit", "Valid Responses"]
+
+
+def random_tree(rnd: random.Random, depth: int) -> dict:
+    """Ragged tree: uneven depth, optional ancestor fields, leaf/ancestor name clashes, missing leaf keys."""
+    node = {k: rnd.choice([rnd.randint(0, 9), f"v{rnd.randint(0, 3)}", None]) for k in rnd.sample(KEYS, rnd.randint(0, 3))}
+    if depth and rnd.random() < 0.8:
+        node["meta"] = {"ignored": True}
+        node["split"] = [random_tree(rnd, depth - 1) for _ in range(rnd.randint(0, 4))]
+    return node
+
+
+def frame(result: dict) -> pd.DataFrame:
+    columns, n_rows = flatten_split_tree(result)
+    df = pd.DataFrame(columns)
+    assert len(df) == n_rows
+    return df
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_legacy_on_random_trees(seed):
+    rnd = random.Random(seed)
+    result = random_tree(rnd, rnd.randint(1, 5))
+    expected = legacy_flatten(result)
+    if not len(expected.columns):
+        # Leaves without fields: pandas keeps the rows but a column dict cannot
+        assert flatten_split_tree(result) == ({}, len(expected))
+        return
+    pd.testing.assert_frame_equal(frame(result), expected)
+
+
+def test_leaf_wins_over_ancestor_and_missing_keys_are_nan():
+    result = {
+        "Provider Group Name": "Zeta",
+        "split": [
+            {"Data center": "DC1", "split": [{"Experiment Tokens": "t0", "Data center": "leaf", "Profit": 1.0}]},
+            {"Data center": "DC2", "split": [{"Experiment Tokens": "t1"}]},
+        ],
+    }
+    df = frame(result)
+    assert list(df.columns) == ["Provider Group Name", "Data center", "Experiment Tokens", "Profit"]
+    assert df["Data center"].tolist() == ["leaf", "DC2"]
+    assert df["Profit"].isna().tolist() == [False, True]
+
+
+def test_reentrant():
+    first = {"split": [{"a": 1}, {"a": 2}]}
+    second = {"split": [{"b": 3}]}
+    assert flatten_split_tree(first) == ({"a": [1, 2]}, 2)
+    assert flatten_split_tree(second) == ({"b": [3]}, 1)
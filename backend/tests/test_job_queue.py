@@ -0,0 +1,43 @@
+import asyncio
+from services.job_queue import CANCELLED, DONE, RUNNING, JobQueue
+
+
+async def sleeper(job):
+    await asyncio.sleep(30)
+
+
+async def wait_for_status(queue, job, status):
+    while queue.get(job.id).status != status:
+        await asyncio.sleep(0.01)
+
+
+def test_shutdown_returns_with_a_running_job(tmp_path):
+    async def scenario():
+        queue = JobQueue(workers=1, directory=str(tmp_path))
+        job, _ = queue.submit("analyze", "key", sleeper)
+        await asyncio.wait_for(wait_for_status(queue, job, RUNNING), 5)
+        await asyncio.wait_for(queue.shutdown(), 5)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == RUNNING  # in flight at shutdown, so lost rather than persisted
+    assert not list(tmp_path.iterdir())
+
+
+def test_cancel_keeps_the_worker_running(tmp_path):
+    async def quick(job):
+        return {"ok": True}
+
+    async def scenario():
+        queue = JobQueue(workers=1, directory=str(tmp_path))
+        slow, _ = queue.submit("analyze", "slow", sleeper)
+        await asyncio.wait_for(wait_for_status(queue, slow, RUNNING), 5)
+        queue.cancel(slow.id)
+        fast, _ = queue.submit("analyze", "fast", quick)
+        await asyncio.wait_for(wait_for_status(queue, fast, DONE), 5)
+        await asyncio.wait_for(queue.shutdown(), 5)
+        return queue.get(slow.id), queue.get(fast.id)
+
+    slow, fast = asyncio.run(scenario())
+    assert slow.status == CANCELLED
+    assert fast.result == {"ok": True}
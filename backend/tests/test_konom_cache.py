@@ -0,0 +1,103 @@
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.konom_query import KONOM_CACHE_OPEN_WINDOW_TTL, cache_ttl_for, canonical_request_key
+from utils import disk_cache
+from utils.disk_cache import DiskCache
+
+REQUEST = {
+    "times": [{"startTime": "2026-01-01T00:00:00Z", "endTime": "2026-01-02T00:00:00Z"}],
+    "rows": [{"dimension": "Data center", "outputName": "Data center", "threshold": "10"}],
+    "measures": ["Bid Price (HB Rendered Ad)", "Valid Responses"],
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(disk_cache.time, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, max_bytes=1 << 20):
+    cache = DiskCache("test", max_bytes=max_bytes)
+    cache.directory = str(tmp_path)
+    return cache
+
+
+def test_key_ignores_field_order_and_query_id():
+    reordered = {k: REQUEST[k] for k in reversed(list(REQUEST))}
+    reordered["rows"] = [dict(reversed(list(REQUEST["rows"][0].items())))]
+    assert canonical_request_key(reordered) == canonical_request_key(REQUEST)
+    assert canonical_request_key({**REQUEST, "queryId": "run-42"}) == canonical_request_key(REQUEST)
+    assert canonical_request_key({**REQUEST, "group_by": ["Data center"]}) == canonical_request_key(REQUEST)
+
+
+def test_key_compares_thresholds_as_strings():
+    numeric = {**REQUEST, "rows": [{**REQUEST["rows"][0], "threshold": 10}]}
+    assert canonical_request_key(numeric) == canonical_request_key(REQUEST)
+    other = {**REQUEST, "rows": [{**REQUEST["rows"][0], "threshold": "20"}]}
+    assert canonical_request_key(other) != canonical_request_key(REQUEST)
+
+
+def test_key_differs_on_the_window():
+    later = {**REQUEST, "times": [{**REQUEST["times"][0], "endTime": "2026-01-03T00:00:00Z"}]}
+    assert canonical_request_key(later) != canonical_request_key(REQUEST)
+
+
+def test_ttl_only_for_open_windows():
+    assert cache_ttl_for(REQUEST) is None
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    open_window = {**REQUEST, "times": [{**REQUEST["times"][0], "endTime": tomorrow}]}
+    assert cache_ttl_for(open_window) == KONOM_CACHE_OPEN_WINDOW_TTL
+    assert cache_ttl_for({**REQUEST, "times": [{"startTime": "2026-01-01T00:00:00Z"}]}) == KONOM_CACHE_OPEN_WINDOW_TTL
+    assert cache_ttl_for({"rows": []}) == KONOM_CACHE_OPEN_WINDOW_TTL
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("open", {"rows": 1}, ttl=900)
+    cache.put("closed", {"rows": 2}, ttl=None)
+    clock.now += 899
+    assert cache.get("open") == {"rows": 1}
+    clock.now += 2
+    assert cache.get("open") is None
+    assert not os.path.exists(cache._path("open"))
+    clock.now += 10 ** 7
+    assert cache.get("closed") == {"rows": 2}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["entries"]) == (2, 1, 1, 1)
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    value = {"payload": "x" * 1000}
+    cache = make_cache(tmp_path)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, value)
+        os.utime(cache._path(key), (100 + i, 100 + i))
+    # Reading "a" makes it the most recently used
+    assert cache.get("a") == value
+    entry_size = os.path.getsize(cache._path("a"))
+
+    cache.max_bytes = 3 * entry_size
+    cache.put("d", value)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == value for key in ["a", "c", "d"])
+    assert cache.stats()["evictions"] == 1
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("key", [1, 2])
+    with open(cache._path("key"), "w") as f:
+        f.write("{not json")
+    assert cache.get("key") is None
+    assert not os.path.exists(cache._path("key"))
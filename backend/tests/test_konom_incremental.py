@@ -0,0 +1,87 @@
+import pytest
+from services.konom_incremental import RECOMPUTE, SUM, WEIGHTED, MergePlan, merge_responses
+
+IMPRESSIONS = "Impressions Delivered (HB Rendered Ad)"
+REQUESTS = "Total Requests Sent (HB Provider Response)"
+WIN_RATE = "Bidder Win Rate (1K)"
+VALID_RATE = "Valid Bid Rate (HB Provider Response)"
+
+METRIC_CONFIG = {
+    WIN_RATE: {"formula": "100000 x Impressions Delivered / Total Requests Sent"},
+    VALID_RATE: {"formula": "Valid Responses / Total Requests Sent"},
+    "Sparse %": {"description": "no formula"},
+}
+REQUEST = {"measures": [IMPRESSIONS, REQUESTS, WIN_RATE, VALID_RATE]}
+
+# Per day and data center: (impressions, requests sent, valid responses); DC3 only runs on day 2
+DAYS = [
+    {"DC1": (120, 4000, 900), "DC2": (30, 2500, 400)},
+    {"DC1": (90, 1000, 700), "DC2": (60, 3500, 350), "DC3": (5, 50, 45)},
+    {"DC1": (150, 6000, 1200), "DC2": (10, 500, 20)},
+]
+
+
+def node(counts, **identity):
+    impressions, requests, valid = counts
+    return {
+        **identity,
+        IMPRESSIONS: impressions,
+        REQUESTS: requests,
+        WIN_RATE: 100000 * impressions / requests,
+        VALID_RATE: valid / requests,
+    }
+
+
+def totals(rows):
+    return tuple(sum(column) for column in zip(*rows))
+
+
+def response(days):
+    """What Konom answers for a window covering `days`: every node's ratios over its own sums."""
+    centers = {}
+    for day in days:
+        for center, counts in day.items():
+            centers.setdefault(center, []).append(counts)
+    children = [node(totals(rows), **{"Data center": center}) for center, rows in centers.items()]
+    root = node(totals([totals(rows) for rows in centers.values()]))
+    return {"queryId": "q", "result": {**root, "split": children}}
+
+
+def by_center(result):
+    return {child["Data center"]: child for child in result["split"]}
+
+
+def test_plan_rules():
+    plan = MergePlan.for_request(REQUEST, METRIC_CONFIG)
+    assert plan.rules[IMPRESSIONS][0] == SUM
+    assert plan.rules[REQUESTS][0] == SUM
+    assert plan.rules[WIN_RATE][0] == RECOMPUTE
+    # Valid Responses is not requested, so the rate can only be weighted by its denominator
+    assert plan.rules[VALID_RATE][0] == WEIGHTED
+
+
+@pytest.mark.parametrize("days", [DAYS[:2], DAYS])
+def test_merged_days_match_the_whole_window(days):
+    plan = MergePlan.for_request(REQUEST, METRIC_CONFIG)
+    merged = merge_responses([response([day]) for day in days], plan)
+    whole = response(days)
+
+    assert merged["queryId"] == "q"
+    pairs = [(merged["result"], whole["result"])]
+    pairs += [(by_center(merged["result"])[c], child) for c, child in by_center(whole["result"]).items()]
+    assert set(by_center(merged["result"])) == set(by_center(whole["result"]))
+    for got, expected in pairs:
+        assert got[IMPRESSIONS] == expected[IMPRESSIONS]
+        assert got[REQUESTS] == expected[REQUESTS]
+        assert got[WIN_RATE] == pytest.approx(expected[WIN_RATE])
+        assert got[VALID_RATE] == pytest.approx(expected[VALID_RATE])
+
+
+@pytest.mark.parametrize("measures", [
+    [IMPRESSIONS, "Sparse %"],  # a percentage with no formula
+    [IMPRESSIONS, VALID_RATE],  # its denominator is not in the request
+    [IMPRESSIONS, "Custom Ratio"],
+])
+def test_unmergeable_measures_fall_back_to_a_whole_window_fetch(measures):
+    request = {"measures": measures, "customMeasures": [{"outputName": "Custom Ratio"}]}
+    assert MergePlan.for_request(request, METRIC_CONFIG) is None
@@ -0,0 +1,56 @@
+import pytest
+from services import prompt_builder
+from services.prompt_builder import count_tokens, encode_table, fit_table
+
+COLUMNS = ["Data center", "Experiment Tokens", "Bid Price", "Profit"]
+
+
+@pytest.fixture(autouse=True)
+def length_estimate(monkeypatch):
+    """Counts tokens as length / 4 so budgets do not depend on whether tiktoken is installed."""
+    monkeypatch.setattr(prompt_builder, "_encoder", None)
+    monkeypatch.setattr(prompt_builder, "_encoder_loaded", True)
+
+
+def make_records(n):
+    return [
+        {"Data center": f"DC{i}", "Experiment Tokens": f"lessCtrl:{i % 2}", "Bid Price": float(i), "Profit": 10.0 * i}
+        for i in range(n)
+    ]
+
+
+def test_table_under_budget_is_sent_whole():
+    records = make_records(5)
+    text, dropped = fit_table(records, COLUMNS, budget=10_000)
+    assert (text, dropped) == (encode_table(records, COLUMNS), 0)
+    # A budget of 0 disables truncation
+    assert fit_table(make_records(500), COLUMNS, budget=0)[1] == 0
+
+
+def test_keeps_the_most_leading_rows_that_fit():
+    records = make_records(100)
+    budget = 300
+    text, dropped = fit_table(records, COLUMNS, budget)
+    kept = len(records) - dropped
+    assert 0 < kept < len(records)
+    assert count_tokens(text) <= budget
+    assert text.startswith(encode_table(records[:kept], COLUMNS) + "\n")
+    # One more row would not have fitted
+    one_more = encode_table(records[:kept + 1], COLUMNS) + "\n" + prompt_builder._summarise_rows(records[kept + 1:], COLUMNS)
+    assert count_tokens(one_more) > budget
+
+
+def test_summary_row_has_the_means_of_the_dropped_rows():
+    records = make_records(100)
+    records[-1]["Profit"] = None
+    text, dropped = fit_table(records, COLUMNS, budget=300)
+    omitted = records[len(records) - dropped:]
+    mean_bid = sum(r["Bid Price"] for r in omitted) / len(omitted)
+    summary = text.splitlines()[-1]
+    assert summary == f"({dropped} more rows omitted to fit the token budget; their means: Bid Price={mean_bid:.2f})"
+
+
+def test_summary_without_numeric_columns():
+    records = [{"Data center": f"DC{i}" * 20} for i in range(50)]
+    text, dropped = fit_table(records, ["Data center"], budget=100)
+    assert text.splitlines()[-1] == f"({dropped} more rows omitted to fit the token budget)"
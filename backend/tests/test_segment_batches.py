@@ -0,0 +1,97 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from config.config_manager import ConfigSnapshot
+from services.agent_runner import DeepDivePrompts, analyze_segments, parse_batch_response, split_segments
+from services.segment_executor import SegmentExecutor
+
+SEGMENT_LINE = re.compile(r"^Segment: (.*)$", re.M)
+CONFIG = ConfigSnapshot(1, {"metric_config": {}, "system_definition": {"BSS": {}}, "deep_dive_config": {}})
+
+
+def answer(segment: str) -> dict:
+    return {"segment": segment, "metrics": [], "key_insights": [f"about {segment}"],
+            "final_verdict": "v", "scalability_verdict": {"verdict": "Hold", "reasons": []}}
+
+
+class FakeCompletions:
+    """Answers every prompt correctly unless `batch_reply` rewrites the reply to a batch."""
+
+    def __init__(self, batch_reply=None):
+        self.batch_reply = batch_reply
+        self.calls = []
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[0]["content"]
+        segments = SEGMENT_LINE.findall(prompt)
+        self.calls.append(len(segments))
+        if "one object per segment" in prompt:
+            replies = [answer(s) for s in segments]
+            content = self.batch_reply(replies) if self.batch_reply else json.dumps(replies)
+        else:
+            content = json.dumps(answer(segments[0]))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def run(completions, segments=4, max_batch=4):
+    df = pd.DataFrame({
+        "Data center": [f"DC{i}" for i in range(segments) for _ in range(2)],
+        "Experiment Tokens": ["lessCtrl:0", "lessCtrl:1"] * segments,
+        "Bid Price (HB Rendered Ad)": [float(i) for i in range(2 * segments)],
+    })
+    columns = list(df.columns)
+    prompts = DeepDivePrompts("BSS", CONFIG, columns, columns)
+    jobs = split_segments(df, ["Data center"])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    results = asyncio.run(analyze_segments(prompts, jobs, client, SegmentExecutor(max_retries=0), False, max_batch))
+    return jobs, {name: json.loads(content) for name, content in results.items()}
+
+
+def assert_every_segment_answered(jobs, results):
+    assert set(results) == {job.segment_name for job in jobs}
+    for name, result in results.items():
+        assert result["key_insights"] == [f"about {name}"]
+
+
+def test_valid_batch_is_one_call():
+    completions = FakeCompletions()
+    jobs, results = run(completions)
+    assert_every_segment_answered(jobs, results)
+    assert completions.calls == [4]
+
+
+def test_malformed_batch_is_split_in_half_down_to_single_prompts():
+    completions = FakeCompletions(batch_reply=lambda replies: "Sorry, I cannot help with that.")
+    jobs, results = run(completions)
+    assert_every_segment_answered(jobs, results)
+    assert completions.calls == [4, 2, 2, 1, 1, 1, 1]
+
+
+def test_segment_missing_from_a_valid_reply_is_asked_again_alone():
+    completions = FakeCompletions(batch_reply=lambda replies: json.dumps(replies[:-1]))
+    jobs, results = run(completions)
+    assert_every_segment_answered(jobs, results)
+    assert completions.calls == [4, 1]
+
+
+def test_renamed_segments_are_matched_by_position():
+    def renamed(replies):
+        return json.dumps([{**reply, "segment": f"Segment {i + 1}"} for i, reply in enumerate(replies)])
+
+    completions = FakeCompletions(batch_reply=renamed)
+    jobs, results = run(completions)
+    assert completions.calls == [4]
+    for job in jobs:
+        assert results[job.segment_name]["key_insights"] == [f"about {job.segment_name}"]
+
+
+def test_parse_batch_response():
+    names = ["a", "b"]
+    assert set(parse_batch_response(json.dumps({"segments": [answer("b"), answer("a")]}), names)) == {"a", "b"}
+    # Matched by name, so a stray extra object is ignored
+    assert set(parse_batch_response(json.dumps([answer("a"), answer("zzz"), answer("b")]), names)) == {"a", "b"}
+    with pytest.raises(ValueError):
+        parse_batch_response(json.dumps({"segment": "a"}), names)
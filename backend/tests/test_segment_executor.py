@@ -0,0 +1,79 @@
+import asyncio
+import time
+from services.segment_executor import SegmentExecutor
+
+
+class RateLimited(Exception):
+    """What the openai client raises on a 429, as far as the executor looks."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+def test_results_keep_input_order_and_on_result_fires_for_each():
+    finished = []
+
+    async def worker(i):
+        await asyncio.sleep((5 - i) * 0.02)  # later items finish first
+        return i * 10
+
+    async def on_result(index, result):
+        finished.append((index, result))
+
+    results = asyncio.run(SegmentExecutor(max_in_flight=5).map(worker, range(5), on_result=on_result))
+    assert results == [0, 10, 20, 30, 40]
+    assert [index for index, _ in finished] == [4, 3, 2, 1, 0]
+    assert sorted(finished) == list(enumerate(results))
+
+
+def test_max_in_flight_holds():
+    running, peak = 0, 0
+
+    async def worker(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    results = asyncio.run(SegmentExecutor(max_in_flight=3).map(worker, range(12)))
+    assert results == list(range(12))
+    assert peak == 3
+
+
+def test_slow_call_times_out_into_its_slot():
+    async def worker(i):
+        await asyncio.sleep(5 if i == 1 else 0)
+        return i
+
+    executor = SegmentExecutor(call_timeout=0.1, max_retries=0)
+    results = asyncio.run(executor.map(worker, range(3)))
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], asyncio.TimeoutError)
+
+
+def test_retry_after_holds_back_every_worker():
+    attempts = {}
+    start = time.perf_counter()
+
+    async def worker(i):
+        attempts.setdefault(i, []).append(time.perf_counter() - start)
+        if len(attempts[i]) == 1:
+            if i == 0:
+                raise RateLimited(retry_after=0.3)
+            await asyncio.sleep(0.05)
+            raise ServerError("unavailable")  # retried after its own short backoff
+        return i
+
+    executor = SegmentExecutor(max_in_flight=4, max_retries=1, base_backoff=0.01, max_backoff=0.01)
+    results = asyncio.run(executor.map(worker, range(4)))
+    assert results == [0, 1, 2, 3]
+    # Every retry waited out the 429's Retry-After window, not just the rate-limited one
+    assert all(times[1] >= 0.29 for times in attempts.values())
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils.single_flight import SingleFlight
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_threads(flight, fn, callers=5):
+    """Starts one leader, waits until every other caller is parked on it, then lets fn finish."""
+    release = threading.Event()
+
+    def work():
+        release.wait(2)
+        return fn()
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(flight.do, "key", work)]
+        wait_for(lambda: flight.stats()["in_flight"] == 1)
+        futures += [pool.submit(flight.do, "key", work) for _ in range(callers - 1)]
+        wait_for(lambda: flight.stats()["coalesced"] == callers - 1)
+        release.set()
+        return futures
+
+
+def test_do_shares_one_execution():
+    flight = SingleFlight()
+    executions = []
+    result = object()
+
+    def fn():
+        executions.append(1)
+        return result
+
+    futures = run_threads(flight, fn)
+    assert all(f.result() is result for f in futures)
+    assert len(executions) == 1
+    assert flight.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "failures": 0, "in_flight": 0}
+
+
+def test_do_shares_the_exception():
+    flight = SingleFlight()
+    error = RuntimeError("konom down")
+
+    def fn():
+        raise error
+
+    futures = run_threads(flight, fn)
+    for f in futures:
+        with pytest.raises(RuntimeError) as exc:
+            f.result()
+        assert exc.value is error
+    assert flight.stats()["failures"] == 1
+    # The key is free again afterwards
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_ado_shares_one_execution_and_the_exception():
+    async def main():
+        flight = SingleFlight()
+        executions = []
+
+        async def fn():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return {"rows": 3}
+
+        results = await asyncio.gather(*(flight.ado("ok", fn) for _ in range(5)))
+        assert all(r is results[0] for r in results)
+
+        async def failing():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("bad")
+
+        errors = await asyncio.gather(*(flight.ado("bad", failing) for _ in range(3)), return_exceptions=True)
+        assert len({id(e) for e in errors}) == 1 and isinstance(errors[0], ValueError)
+        assert len(executions) == 2
+        assert flight.stats() == {"calls": 8, "executions": 2, "coalesced": 6, "failures": 1, "in_flight": 0}
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_waiter_does_not_cancel_the_shared_task():
+    async def main():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def fn():
+            started.set()
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.ado("key", fn))
+        await started.wait()
+        follower = asyncio.create_task(flight.ado("key", fn))
+        await asyncio.sleep(0)
+
+        # Cancel the caller that started the work, the other one still gets the result
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        assert await follower == "done"
+        assert flight.stats()["failures"] == 0
+
+    asyncio.run(main())
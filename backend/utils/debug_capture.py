@@ -0,0 +1,53 @@
+import os
+import random
+import threading
+import time
+import logging
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+# Off by default: when disabled, callers skip capture entirely with one attribute check
+ENABLED = os.getenv("DEBUG_CAPTURE", "0") == "1"
+CAPTURE_DIR = os.path.expanduser(os.getenv("DEBUG_CAPTURE_DIR", "~/.agentic_ai_debug"))
+SAMPLE_RATE = float(os.getenv("DEBUG_CAPTURE_SAMPLE_RATE", "1.0"))
+MAX_BYTES = int(os.getenv("DEBUG_CAPTURE_MAX_BYTES", str(1024 * 1024)))
+KEEP_FILES = int(os.getenv("DEBUG_CAPTURE_KEEP_FILES", "50"))
+
+_lock = threading.Lock()
+
+
+def capture(kind: str, payload: Union[bytes, str], force: bool = False):
+    """
+    Writes a raw payload (e.g. a Konom response body) to CAPTURE_DIR, truncated to
+    MAX_BYTES and sampled at SAMPLE_RATE unless forced. Only the newest KEEP_FILES
+    captures are kept. Callers should check `ENABLED` first so the disabled path
+    never touches the payload.
+    """
+    if not force and random.random() >= SAMPLE_RATE:
+        return
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    truncated = len(data) > MAX_BYTES
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}-{kind}.json"
+    try:
+        os.makedirs(CAPTURE_DIR, exist_ok=True)
+        with open(os.path.join(CAPTURE_DIR, name), "wb") as f:
+            f.write(data[:MAX_BYTES])
+        logger.info(f"Debug capture written: {name} ({len(data)} bytes{', truncated' if truncated else ''})")
+        _rotate()
+    except OSError as e:
+        logger.warning(f"Debug capture failed: {e}")
+
+
+def _rotate():
+    with _lock:
+        try:
+            files = [os.path.join(CAPTURE_DIR, f) for f in os.listdir(CAPTURE_DIR)]
+            files.sort(key=os.path.getmtime)
+        except OSError:
+            return
+        for path in files[:-KEEP_FILES] if KEEP_FILES > 0 else files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,5 +1,111 @@
 import json
+import os
 import re
+import asyncio
+import hashlib
+import inspect
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Optional
+from utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "o3-mini"
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+if TYPE_CHECKING:
+    import openai
+
+llm_cache = DiskCache("llm", max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024)
+
+_async_client: Optional["openai.AsyncOpenAI"] = None
+
+def get_async_llm_client() -> "openai.AsyncOpenAI":
+    """Shared AsyncOpenAI client, created on first use once .env is loaded (openai is slow to import)."""
+    global _async_client
+    if _async_client is None:
+        import openai
+        _async_client = openai.AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _async_client
+
+async def close_llm_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+def normalise_prompt(prompt: str) -> str:
+    """Whitespace-only differences (indentation of the template, line endings) do not change the answer."""
+    lines = prompt.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+def prompt_cache_key(prompt: str, model: str = LLM_MODEL) -> str:
+    payload = f"{model}\n{normalise_prompt(prompt)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _is_cacheable(content: Any, cache_if: Optional[Callable[[str], Any]]) -> bool:
+    if not isinstance(content, str) or not content.strip():
+        return False
+    if cache_if is None:
+        return True
+    try:
+        return bool(cache_if(content))
+    except Exception:
+        return False
+
+async def complete_prompt(
+    llm_client: Any,
+    prompt: str,
+    timeout: Optional[float] = None,
+    use_cache: bool = LLM_CACHE_ENABLED,
+    cache_if: Optional[Callable[[str], Any]] = None,
+) -> str:
+    """
+    Sends one chat completion through any OpenAI-compatible client. Async clients are
+    awaited directly; a synchronous client (or fake) is run in a worker thread.
+    With use_cache, answers are looked up by model + normalised prompt first, and new
+    answers are stored when cache_if (if given) accepts them, so a reply the caller
+    cannot parse is asked for again next time.
+    """
+    if use_cache:
+        cached = await cached_completion(prompt)
+        if cached is not None:
+            return cached
+
+    content = await _create_completion(llm_client, prompt, timeout)
+
+    if use_cache and _is_cacheable(content, cache_if):
+        await store_completion(prompt, content)
+    return content
+
+async def cached_completion(prompt: str) -> Optional[str]:
+    """The cached answer to this prompt, if there is one."""
+    cache_key = prompt_cache_key(prompt)
+    cached = await asyncio.to_thread(llm_cache.get, cache_key)
+    if cached is not None:
+        logger.info(f"LLM cache hit for {cache_key[:12]}")
+    return cached
+
+async def store_completion(prompt: str, content: str):
+    """Stores an answer as if `prompt` had produced it (used for answers split out of a batch)."""
+    await asyncio.to_thread(llm_cache.put, prompt_cache_key(prompt), content)
+
+async def _create_completion(llm_client: Any, prompt: str, timeout: Optional[float]) -> str:
+    if llm_client is None:
+        llm_client = get_async_llm_client()
+    create = llm_client.chat.completions.create
+    kwargs = {"model": LLM_MODEL, "messages": [{"role": "user", "content": prompt}]}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    if inspect.iscoroutinefunction(create):
+        response = await create(**kwargs)
+    else:
+        response = await asyncio.to_thread(create, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+    return response.choices[0].message.content
 
 def safe_parse_llm_json(text: str) -> dict:
     try:
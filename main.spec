@@ -6,7 +6,12 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('backend/.env', '.'), ('backend/configs/*', 'configs')],
-    hiddenimports=[],
+    # Imported by name at runtime (main.PRELOAD_MODULES, pandas' parquet engine, tiktoken's
+    # encoding plugins when tiktoken is installed), which the import scan cannot follow
+    hiddenimports=[
+        'services.agent_runner', 'services.llm_analyzer', 'services.data_loader', 'openai',
+        'pyarrow.parquet', 'tiktoken_ext.openai_public',
+    ],
     hookspath=[],
     runtime_hooks=[],
     excludes=[],
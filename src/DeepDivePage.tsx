@@ -1,6 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { useAnalysisContext } from './contexts/AnalysisContext';
-import { sendDeepDiveQuery } from './lib/api';
+import { streamDeepDiveQuery } from './lib/api';
 // @ts-ignore
 import html2pdf from 'html2pdf.js';
 import { useNavigate } from 'react-router-dom';
@@ -90,12 +90,18 @@ const DeepDivePage = () => {
     setResponse(null);
     abortControllerRef.current = new AbortController();
     try {
-      const result = await sendDeepDiveQuery({
+      // Render each segment as soon as the backend streams it
+      setResponse({ segments: [] });
+      await streamDeepDiveQuery({
         request_json: requestJson,
         system,
         dimensions,
+      }, {
+        onSegment: (segment) => setResponse((prev: any) => ({ ...prev, segments: [...(prev?.segments || []), segment] })),
+        onOverall: ({ overall_commentary, prompt_report }) =>
+          setResponse((prev: any) => ({ ...prev, overall_commentary, prompt_report })),
+        onError: (detail, segment) => console.error(`Segment ${segment} failed:`, detail),
       }, abortControllerRef.current.signal);
-      setResponse(result);
     } catch (err: any) {
       if (err.name === 'AbortError' || (err.message && err.message.includes('Konom fetch failed'))) {
         setError(null);
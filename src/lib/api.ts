@@ -69,6 +69,88 @@ export async function sendDeepDiveQuery(payload: any) {
   return await response.json();
 }
 
+// Streams /deep-dive-query/stream (NDJSON): segments arrive as they finish, the overall commentary last
+export async function streamDeepDiveQuery(
+  payload: any,
+  handlers: {
+    onSegment: (segment: any) => void;
+    onOverall?: (overall: any) => void;
+    onError?: (detail: string, segment?: string) => void;
+  },
+  signal?: AbortSignal
+) {
+  const response = await fetch(`${BASE_URL}/deep-dive-query/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(payload),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`Backend error: ${response.status} - ${await response.text()}`);
+  }
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.type === "segment") {
+      handlers.onSegment(event.segment);
+    } else if (event.type === "overall") {
+      handlers.onOverall?.(event);
+    } else if (event.type === "error") {
+      // A failed segment is reported and skipped; any other error ends the analysis
+      if (event.segment) handlers.onError?.(event.detail, event.segment);
+      else throw new Error(event.detail);
+    }
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+}
+
+// Stored analyses, newest first; filters match the /results query parameters
+export async function listResults(filters: {
+  experiment_token?: string;
+  provider?: string;
+  start?: string;
+  end?: string;
+  system?: string;
+  kind?: "analyze" | "deep_dive";
+} = {}) {
+  const params = new URLSearchParams(
+    Object.entries(filters).filter(([, value]) => value !== undefined) as [string, string][]
+  );
+  const response = await fetch(`${BASE_URL}/results?${params}`);
+
+  if (!response.ok) {
+    throw new Error(`Backend error: ${response.status} - ${await response.text()}`);
+  }
+
+  return (await response.json()).results;
+}
+
+export async function getResult(resultId: string, includeFrame = false) {
+  const response = await fetch(`${BASE_URL}/results/${encodeURIComponent(resultId)}?include_frame=${includeFrame}`);
+
+  if (!response.ok) {
+    throw new Error(`Backend error: ${response.status} - ${await response.text()}`);
+  }
+
+  return await response.json();
+}
+
 
 // const BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localhost:8000/api";
 